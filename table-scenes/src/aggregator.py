@@ -1,11 +1,43 @@
 # 结果聚合
+import math
+import time
 from collections import Counter, deque
 
+import numpy as np
+
 
 class SlidingCounter:
-    def __init__(self, seconds=10, fps=20):
-        self.maxlen = max(1, seconds*fps)
-        self.buf = deque(maxlen=self.maxlen)
+    """滑动窗口内的物品计数。
+
+    unique=False: 窗口内逐帧检测数之和（同一个杯子出现 30 帧计为 30）
+    unique=True:  窗口内出现过的不同跟踪 id 数（需要经过 tracker 的 Detections，
+                  没有 track_id 的检测每个框视为一个新物体）
+
+    mode="frames": 窗口为最近 seconds*fps 帧（推理跟不上配置帧率时实际覆盖的时间会变长）
+    mode="time":   窗口为最近 seconds 秒，按单调时间戳移出旧帧，与实际帧率无关
+    decay_s:       time 模式下可选的指数衰减时间常数，每帧计数按 exp(-帧龄/decay_s) 加权
+                   （只用于 unique=False；结果为浮点数）
+    """
+
+    def __init__(self, seconds=10, fps=20, unique=False, mode="frames", decay_s=None, clock=time.monotonic):
+        if mode not in ("frames", "time"):
+            raise ValueError(f"未知的窗口模式: {mode}")
+        self.seconds = seconds
+        self.by_time = mode == "time"
+        self.maxlen = max(1, int(seconds*fps))
+        self.buf = deque() if self.by_time else deque(maxlen=self.maxlen)
+        self.ts_buf = deque()    # time 模式：与 buf 对应的时间戳
+        self.unique = unique
+        self.decay_s = decay_s if self.by_time and decay_s and not unique else None
+        self.clock = clock
+        self._since = None       # time 模式：reset 后第一帧的时间戳
+        self._last_ts = None     # 衰减模式：上次更新的时间戳
+        self._names_src = None   # 上次见到的 Detections.names，用于缓存名称映射
+        self._norm_names = []
+        self._tid_refs = Counter()   # unique 模式：跟踪 id -> 窗口内出现的帧数
+        self._unique = Counter()     # unique 模式：名称 -> 窗口内不同跟踪 id 数
+        self._total = Counter()      # 窗口内逐帧计数之和，随 update_and_sum 增量更新
+        self._next_anon = -1         # 没有 track_id 的检测使用的临时负数 id
         
         # 定义文本变体映射，将多个描述映射到主要类别
         self.text_variant_mapping = {
@@ -51,18 +83,275 @@ class SlidingCounter:
     def reset(self):
         """重置滑动窗口，清空所有历史检测"""
         self.buf.clear()
+        self.ts_buf.clear()
+        self._since = self._last_ts = None
+        self._total.clear()
+        self._tid_refs.clear()
+        self._unique.clear()
         
     def get_buffer_fullness(self):
-        """获取缓冲区填充程度 (0.0-1.0)"""
+        """获取缓冲区填充程度 (0.0-1.0)；time 模式为 reset 以来覆盖的时长占窗口的比例"""
+        if self.by_time:
+            if self._since is None or not self.ts_buf or self.seconds <= 0:
+                return 0
+            return min(1.0, (self.ts_buf[-1] - self._since) / self.seconds)
         return len(self.buf) / self.maxlen if self.maxlen > 0 else 0
+
+    def _evicted(self, now):
+        """移出窗口的帧 -> [(帧, 时间戳)]"""
+        if not self.by_time:
+            return [(self.buf.popleft(), None)] if len(self.buf) == self.maxlen else []
+        out = []
+        cutoff = now - self.seconds
+        while self.ts_buf and self.ts_buf[0] <= cutoff:
+            out.append((self.buf.popleft(), self.ts_buf.popleft()))
+        return out
+
+    def _append(self, item, now):
+        self.buf.append(item)
+        if self.by_time:
+            self.ts_buf.append(now)
+            if self._since is None:
+                self._since = now
     
-    def update_and_sum(self, names):
+    def _frame_counts(self, names):
+        """一帧检测结果 -> 标准化名称的 Counter"""
+        if hasattr(names, "cls_id"):
+            # Detections：按类别 id 计数，只对出现的类别做名称映射
+            dets = names
+            if self._names_src is not dets.names:
+                self._names_src = dets.names
+                self._norm_names = [self.normalize_detection_name(n) for n in dets.names]
+            c = Counter()
+            per_class = dets.class_counts()
+            for i in np.flatnonzero(per_class).tolist():
+                c[self._norm_names[i]] += int(per_class[i])
+            return c
         # 对所有名称进行标准化处理
-        normalized_names = [self.normalize_detection_name(name) for name in names]
-        
-        c = Counter(normalized_names)
-        self.buf.append(c)
-        total = Counter()
-        for x in self.buf:
-            total.update(x)
-        return total
\ No newline at end of file
+        return Counter(self.normalize_detection_name(name) for name in names)
+
+    def _frame_tracks(self, dets):
+        """一帧检测结果 -> {跟踪 id: 标准化名称}"""
+        if hasattr(dets, "cls_id"):
+            if self._names_src is not dets.names:
+                self._names_src = dets.names
+                self._norm_names = [self.normalize_detection_name(n) for n in dets.names]
+            names = [self._norm_names[i] for i in dets.cls_id.tolist()]
+            if dets.track_id is not None:
+                return dict(zip(dets.track_id.tolist(), names))
+        else:
+            names = [self.normalize_detection_name(n) for n in dets]
+        ids = range(self._next_anon, self._next_anon - len(names), -1)
+        self._next_anon -= len(names)
+        return dict(zip(ids, names))
+
+    def _update_unique(self, dets, now):
+        """unique 模式：只对新进入和移出窗口的跟踪 id 增减计数"""
+        for old, _ in self._evicted(now):
+            for tid, name in old.items():
+                self._tid_refs[tid] -= 1
+                if self._tid_refs[tid] == 0:
+                    del self._tid_refs[tid]
+                    self._unique[name] -= 1
+                    if self._unique[name] == 0:
+                        del self._unique[name]
+        frame = self._frame_tracks(dets)
+        self._append(frame, now)
+        for tid, name in frame.items():
+            if tid not in self._tid_refs:
+                self._unique[name] += 1
+            self._tid_refs[tid] += 1
+        return Counter(self._unique)
+
+    def update_and_sum(self, names, ts=None):
+        """names 为名称列表或 Detections；ts 为帧的单调时间戳（time 模式使用，默认取当前时间）"""
+        now = ts if ts is not None else (self.clock() if self.by_time else None)
+        if self.unique:
+            return self._update_unique(names, now)
+        total = self._total
+        if self.decay_s:
+            return self._update_decayed(names, now)
+        # 增量维护窗口总数：加上新帧、减去移出窗口的帧，只涉及这些帧出现的类别
+        for old, _ in self._evicted(now):
+            for name, n in old.items():
+                left = total[name] - n
+                if left:
+                    total[name] = left
+                else:
+                    del total[name]
+        c = self._frame_counts(names)
+        self._append(c, now)
+        total.update(c)
+        return Counter(total)  # 返回副本，调用方（如渲染线程）持有的结果不随后续帧变化
+
+    def _update_decayed(self, names, now):
+        """指数衰减加权和：总数整体乘以衰减因子，再减去移出窗口帧的剩余权重"""
+        total = self._total
+        if self._last_ts is not None and now > self._last_ts:
+            f = math.exp(-(now - self._last_ts) / self.decay_s)
+            for name in total:
+                total[name] *= f
+        self._last_ts = now
+        for old, ts in self._evicted(now):
+            w = math.exp(-(now - ts) / self.decay_s)
+            for name, n in old.items():
+                left = total[name] - n * w
+                if left > 1e-6:
+                    total[name] = left
+                else:
+                    del total[name]
+        c = self._frame_counts(names)
+        self._append(c, now)
+        total.update(c)
+        return Counter(total)
+
+
+class MultiHorizonCounter:
+    """NumPy 环形缓冲区实现的多时间尺度计数，按类别 id 索引。
+
+    每帧一个计数向量（标准化名称对应的列），一次更新同时维护多个时间窗口的和
+    （例如 1s / 5s / 30s）以及可选的 EWMA，不再为每帧构造 Counter。
+    与 SlidingCounter 接口兼容：update_and_sum 返回 seconds 对应窗口的 Counter，
+    reset / get_buffer_fullness / normalize_detection_name 用法相同。
+
+    horizons: 各窗口时长（秒）；seconds 不在其中时会自动加入
+    ewma_s:   EWMA 时间常数（秒），None 不计算；ewma 为每帧平均计数
+    """
+
+    def __init__(self, seconds=1, horizons=(5, 30), fps=20, ewma_s=None, clock=time.monotonic):
+        self.horizons = np.array(sorted(set(horizons) | {seconds}), dtype=np.float64)
+        self.primary = int(np.flatnonzero(self.horizons == seconds)[0])
+        self.ewma_s = ewma_s
+        self.clock = clock
+        self._normalizer = SlidingCounter(seconds=seconds, fps=fps)
+        self.normalize_detection_name = self._normalizer.normalize_detection_name
+        self.names = []          # 列下标 -> 标准化名称
+        self.index = {}          # 标准化名称 -> 列下标
+        self._names_src = None
+        self._lut = np.zeros(0, dtype=np.int64)   # Detections 类别 id -> 列下标
+        cap = max(16, int(self.horizons[-1] * fps * 1.25))
+        self.ring = np.zeros((cap, 16), dtype=np.int32)
+        self.ts = np.zeros(cap, dtype=np.float64)
+        self.sums = np.zeros((len(self.horizons), 16), dtype=np.int64)
+        self.ewma = np.zeros(16, dtype=np.float64)
+        self.head = 0            # 下一帧写入的位置
+        self.tails = [0] * len(self.horizons)   # 每个窗口中最旧一帧的位置
+        self._last_ts = None
+        self._since = None
+
+    def reset(self):
+        """清空所有窗口"""
+        self.sums[:] = 0
+        self.ewma[:] = 0
+        self.tails = [self.head] * len(self.horizons)
+        self._last_ts = self._since = None
+
+    def get_buffer_fullness(self):
+        """reset 以来覆盖的时长占主窗口 (seconds) 的比例"""
+        if self._since is None:
+            return 0
+        return min(1.0, (self._last_ts - self._since) / self.horizons[self.primary])
+
+    def _column(self, name):
+        i = self.index.get(name)
+        if i is None:
+            i = self.index[name] = len(self.names)
+            self.names.append(name)
+            if i >= self.ring.shape[1]:
+                # 列不够时按倍数扩展（出现新类别时才发生）
+                extra = self.ring.shape[1]
+                self.ring = np.pad(self.ring, ((0, 0), (0, extra)))
+                self.sums = np.pad(self.sums, ((0, 0), (0, extra)))
+                self.ewma = np.pad(self.ewma, (0, extra))
+        return i
+
+    def _frame_vector(self, dets):
+        """一帧检测结果 -> 各列计数向量"""
+        vec = np.zeros(self.ring.shape[1], dtype=np.int32)
+        if hasattr(dets, "cls_id"):
+            if self._names_src is not dets.names:
+                self._names_src = dets.names
+                self._lut = np.array([self._column(self.normalize_detection_name(n)) for n in dets.names],
+                                     dtype=np.int64)
+                vec = np.zeros(self.ring.shape[1], dtype=np.int32)
+            if len(dets):
+                cols = np.bincount(self._lut[dets.cls_id], minlength=len(self.names))
+                vec[:len(cols)] = cols
+            return vec
+        for name in dets:
+            i = self._column(self.normalize_detection_name(name))
+            if i >= len(vec):
+                vec = np.pad(vec, (0, self.ring.shape[1] - len(vec)))
+            vec[i] += 1
+        return vec
+
+    def _grow(self):
+        """环形缓冲区写满（实际帧率高于预估）时容量翻倍，按时间顺序展开"""
+        cap = len(self.ts)
+        order = (self.head + np.arange(cap)) % cap
+        self.ring = np.concatenate([self.ring[order], np.zeros_like(self.ring)])
+        self.ts = np.concatenate([self.ts[order], np.zeros(cap)])
+        # 空窗口（tail 等于 head）指向新的写入位置
+        self.tails = [cap if t == self.head else (t - self.head) % cap for t in self.tails]
+        self.head = cap
+
+    def update(self, dets, ts=None):
+        """加入一帧，返回各窗口的计数和 (len(horizons), 列数)"""
+        now = ts if ts is not None else self.clock()
+        vec = self._frame_vector(dets)
+        cap = len(self.ts)
+        if (self.head + 1) % cap == self.tails[-1]:
+            self._grow()
+            cap = len(self.ts)
+        self.ring[self.head] = vec
+        self.ts[self.head] = now
+        self.head = (self.head + 1) % cap
+        self.sums += vec
+        # 每个窗口移出过期的帧，时间戳单调递增，移出总量均摊 O(1)
+        for h, horizon in enumerate(self.horizons):
+            t = self.tails[h]
+            cutoff = now - horizon
+            while t != self.head and self.ts[t] <= cutoff:
+                self.sums[h] -= self.ring[t]
+                t = (t + 1) % cap
+            self.tails[h] = t
+        if self.ewma_s:
+            a = math.exp(-(now - self._last_ts) / self.ewma_s) if self._last_ts is not None else 0.0
+            self.ewma *= a
+            self.ewma += (1 - a) * vec
+        self._last_ts = now
+        if self._since is None:
+            self._since = now
+        return self.sums
+
+    def counts(self, horizon=None):
+        """某个窗口（秒，默认 seconds）的计数 -> Counter"""
+        h = self.primary if horizon is None else int(np.flatnonzero(self.horizons == horizon)[0])
+        row = self.sums[h]
+        return Counter({self.names[i]: int(row[i]) for i in np.flatnonzero(row[:len(self.names)]).tolist()})
+
+    def vector(self, horizon=None):
+        """某个窗口的计数向量（列顺序同 names，视图，下一次 update 时改变）"""
+        h = self.primary if horizon is None else int(np.flatnonzero(self.horizons == horizon)[0])
+        return self.sums[h, :len(self.names)]
+
+    def ewma_counts(self):
+        """EWMA 每帧平均计数 -> {名称: 浮点数}"""
+        return {self.names[i]: float(self.ewma[i]) for i in np.flatnonzero(self.ewma[:len(self.names)] > 1e-6)}
+
+    def update_and_sum(self, names, ts=None):
+        """与 SlidingCounter.update_and_sum 相同：names 为名称列表或 Detections，返回主窗口计数"""
+        self.update(names, ts)
+        return self.counts()
+
+
+def load_window(cfg_window, fps, unique=False):
+    """按 window 配置构建 SlidingCounter（mode: frames / time）或 MultiHorizonCounter（mode: multi）"""
+    mode = cfg_window.get("mode", "frames")
+    if mode == "multi" and not unique:
+        return MultiHorizonCounter(seconds=cfg_window["seconds"], horizons=cfg_window.get("horizons", (5, 30)),
+                                   fps=fps, ewma_s=cfg_window.get("ewma_s"))
+    if mode == "multi":
+        mode = "time"  # 按跟踪 id 去重计数由 SlidingCounter 处理
+    return SlidingCounter(seconds=cfg_window["seconds"], fps=fps, unique=unique,
+                          mode=mode, decay_s=cfg_window.get("decay_s"))
@@ -0,0 +1,222 @@
+"""
+端到端性能基准
+
+用 data/raw 和 data/yolo/images 中的样例图片构造合成视频流，依次驱动
+预处理、YoloDetector、ROI 过滤、SlidingCounter、decide_scene 和可视化绘制，
+统计帧率、各阶段延迟和峰值内存，结果保存为 JSON 便于不同提交之间对比。
+
+--stub 模式不加载模型权重，检测结果取自 data/yolo/labels 中的标注，
+用于单独测量非模型阶段的开销。
+
+用法（在项目根目录运行）:
+    python src/benchmark.py --stub --frames 500
+    python src/benchmark.py --frames 200 --out runs/bench/full.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+import yaml
+
+from aggregator import load_window
+from detections import Detections
+from metrics import Metrics
+from preprocess import load_preprocessor
+from roi import load_crop, load_roi, draw_roi
+from scene_rules import load_scene_rules
+from viz import overlay_scene, overlay_counts, draw_detections
+
+IMAGE_GLOBS = ["data/raw/*.jpg", "data/yolo/images/*/*.jpg"]
+
+
+def imread(path):
+    # cv2.imread 在 Windows 上不支持中文路径
+    return cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def load_frames(size):
+    """读取样例图片并缩放到摄像头分辨率，返回 [(path, frame)]"""
+    paths = sorted(p for g in IMAGE_GLOBS for p in glob.glob(g))
+    frames = []
+    for p in paths:
+        img = imread(p)
+        if img is None:
+            print(f"警告: 无法读取图片 {p}")
+            continue
+        frames.append((p, cv2.resize(img, size, interpolation=cv2.INTER_AREA)))
+    return frames
+
+
+class StubDetector:
+    """不加载权重的替身检测器：返回图片对应标注作为检测结果"""
+
+    def __init__(self, frames, label_names, metrics, model_cfg):
+        self.metrics = metrics
+        self.pre = load_preprocessor(model_cfg)
+        self.names = tuple(label_names[i] for i in sorted(label_names))
+        self.by_id = {}
+        for p, frame in frames:
+            dets = self._load_labels(p, frame.shape, label_names)
+            self.by_id[id(frame)] = Detections.from_dicts(dets, self.names)
+        self.current = Detections.empty(self.names)
+
+    @staticmethod
+    def _load_labels(image_path, shape, label_names):
+        stem = os.path.splitext(os.path.basename(image_path))[0]
+        candidates = glob.glob(os.path.join("data", "yolo", "labels", "*", stem + ".txt"))
+        h, w = shape[:2]
+        dets = []
+        if candidates:
+            for line in open(candidates[0], encoding="utf-8"):
+                parts = line.split()
+                if len(parts) != 5:
+                    continue
+                cls_id, cx, cy, bw, bh = int(parts[0]), *map(float, parts[1:])
+                dets.append({
+                    "name": label_names.get(cls_id, str(cls_id)),
+                    "xyxy": [(cx - bw / 2) * w, (cy - bh / 2) * h, (cx + bw / 2) * w, (cy + bh / 2) * h],
+                    "conf": 0.9,
+                })
+        if not dets:
+            # 没有标注的图片给一组固定的桌面物品
+            dets = [
+                {"name": "cup", "xyxy": [0.3 * w, 0.4 * h, 0.4 * w, 0.55 * h], "conf": 0.8},
+                {"name": "laptop", "xyxy": [0.45 * w, 0.3 * h, 0.75 * w, 0.6 * h], "conf": 0.85},
+            ]
+        return dets
+
+    def preprocess(self, frame, crop=None):
+        with self.metrics.timer("preprocess"):
+            self.current = self.by_id.get(id(frame), self.current)
+            return self.pre(frame, crop)
+
+    def predict(self, prep):
+        return self.current[np.arange(len(self.current))]  # 与真实检测器一样每帧返回新对象
+
+
+def peak_rss_mb():
+    """进程峰值常驻内存 (MB)"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024  # macOS 为字节，Linux 为 KB
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1024 / 1024
+    except ImportError:
+        return None
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def run_benchmark(cfg, classes, n_frames=300, stub=False, draw=True, warmup=5):
+    metrics = Metrics()
+    cam = cfg["camera"]
+    frames = load_frames((cam["width"], cam["height"]))
+    if not frames:
+        raise FileNotFoundError(f"找不到样例图片: {IMAGE_GLOBS}")
+    print(f"合成视频流: {len(frames)} 张图片, {cam['width']}x{cam['height']}, 共 {n_frames} 帧")
+
+    if stub:
+        label_names = yaml.safe_load(open("data/yolo/data.yaml", encoding="utf-8"))["names"]
+        det = StubDetector(frames, label_names, metrics, cfg["model"])
+    else:
+        from detector import YoloDetector
+        det = YoloDetector(cfg["model"], classes, metrics=metrics)
+
+    roi_fn = load_roi(cfg["roi"])
+    crop = load_crop(cfg["roi"])
+    win = load_window(cfg["window"], cam["fps"])
+    scorer = load_scene_rules(cfg.get("scene_rules")).scorer
+    max_items = cfg.get("viz", {}).get("max_items", 8)
+
+    # 预热（模型首帧开销不计入统计）
+    for i in range(min(warmup, n_frames)):
+        det.predict(det.preprocess(frames[i % len(frames)][1], crop))
+    metrics.histograms.clear()
+
+    scenes = {}
+    t_start = time.perf_counter()
+    for i in range(n_frames):
+        t_frame = time.perf_counter()
+        frame = frames[i % len(frames)][1]
+        dets = det.predict(det.preprocess(frame, crop))
+        if roi_fn:
+            with metrics.timer("roi_filter"):
+                dets = roi_fn.filter(dets)
+        with metrics.timer("aggregation"):
+            counts = win.update_and_sum(dets)
+        with metrics.timer("scene_decision"):
+            scene = scorer.decide(counts)
+        scenes[scene] = scenes.get(scene, 0) + 1
+        if draw:
+            with metrics.timer("render"):
+                canvas = frame.copy()  # 不修改样例帧，便于循环使用
+                draw_detections(canvas, dets)
+                overlay_scene(canvas, scene)
+                overlay_counts(canvas, counts, max_items=max_items)
+                draw_roi(canvas, cfg["roi"])
+        metrics.observe("frame_total", time.perf_counter() - t_frame)
+    elapsed = time.perf_counter() - t_start
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "mode": "stub" if stub else "model",
+        "weights": None if stub else cfg["model"]["weights"],
+        "frames": n_frames,
+        "images": len(frames),
+        "resolution": [cam["width"], cam["height"]],
+        "fps": n_frames / elapsed if elapsed > 0 else 0.0,
+        "elapsed_s": elapsed,
+        "peak_rss_mb": peak_rss_mb(),
+        "scenes": scenes,
+        "stages": metrics.to_dict()["stages"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="table-scenes 端到端性能基准")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--classes", default="config/classes_coco.yaml")
+    parser.add_argument("--frames", type=int, default=300, help="合成视频流的帧数")
+    parser.add_argument("--stub", action="store_true", help="不加载模型，检测结果取自标注")
+    parser.add_argument("--no-draw", action="store_true", help="不测量可视化绘制")
+    parser.add_argument("--out", default=None, help="结果 JSON 路径，默认 runs/bench/<commit>-<mode>.json")
+    args = parser.parse_args()
+
+    cfg = yaml.safe_load(open(args.config, encoding="utf-8"))
+    classes = yaml.safe_load(open(args.classes, encoding="utf-8"))["names"]
+    result = run_benchmark(cfg, classes, n_frames=args.frames, stub=args.stub, draw=not args.no_draw)
+
+    print(f"\n帧率: {result['fps']:.1f} fps, 峰值内存: {result['peak_rss_mb'] or 0:.0f} MB")
+    for name, s in sorted(result["stages"].items()):
+        print(f"  {name:15s} p50={s['p50_ms']:8.3f}ms  p95={s['p95_ms']:8.3f}ms  p99={s['p99_ms']:8.3f}ms")
+
+    out = args.out or os.path.join("runs", "bench", f"{result['commit'] or 'local'}-{result['mode']}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存到: {out}")
+
+
+if __name__ == "__main__":
+    main()
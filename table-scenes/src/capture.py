@@ -0,0 +1,201 @@
+# 视频源 - 摄像头后台抓帧（消费端总是拿最新一帧）与录像文件回放
+import os
+import threading
+import time
+from collections import deque
+
+import cv2
+
+
+class FrameGrabber:
+    """在后台线程中持续读取摄像头，帧放入小环形缓冲区。
+
+    消费端调用 read() 只取最新的一帧，被跳过的旧帧计入 dropped，
+    这样检测耗时不会叠加到摄像头缓冲排队的延迟上。
+    """
+
+    def __init__(self, cap, buffer_size=2, clock=time.monotonic, fps=None):
+        self.cap = cap
+        self.fps = fps  # 标称帧率，用于确定滑动窗口长度
+        self.clock = clock
+        self.buf = deque(maxlen=max(1, buffer_size))
+        self.cond = threading.Condition()
+        self.frame_id = 0       # 已抓取的帧总数
+        self.last_read_id = 0   # 消费端上次拿到的帧号
+        self.dropped = 0        # 未被消费就被覆盖/跳过的帧数
+        self.running = False
+        self.finished = False   # 源已结束（读失败或已停止）
+        self.thread = None
+
+    def start(self):
+        if self.running:
+            return self
+        self.running = True
+        self.thread = threading.Thread(target=self._worker, name="frame-grabber", daemon=True)
+        self.thread.start()
+        return self
+
+    def _worker(self):
+        while self.running:
+            ok, frame = self.cap.read()
+            ts = self.clock()
+            with self.cond:
+                if not ok:
+                    self.finished = True
+                    self.cond.notify_all()
+                    break
+                self.frame_id += 1
+                self.buf.append((self.frame_id, ts, frame))
+                self.cond.notify_all()
+
+    def read(self, timeout=5.0):
+        """取最新一帧，返回 (ok, frame, ts)。
+
+        ts 为抓帧时刻（单调时钟），超时或源结束时 ok 为 False。
+        """
+        deadline = self.clock() + timeout
+        with self.cond:
+            while not self.buf or self.buf[-1][0] <= self.last_read_id:
+                if self.finished or not self.running:
+                    return False, None, None
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    return False, None, None
+                self.cond.wait(remaining)
+            fid, ts, frame = self.buf[-1]
+            # 上次读取之后、最新帧之前的帧都被丢弃
+            self.dropped += fid - self.last_read_id - 1
+            self.last_read_id = fid
+            self.buf.clear()
+        return True, frame, ts
+
+    def stats(self):
+        """返回抓帧统计"""
+        with self.cond:
+            return {"grabbed": self.frame_id, "dropped": self.dropped}
+
+    def stop(self):
+        self.running = False
+        with self.cond:
+            self.finished = True  # 停止后消费端不再等待新帧
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+            self.thread = None
+
+    def release(self):
+        self.stop()
+        self.cap.release()
+
+
+VIDEO_EXTS = (".mp4", ".avi", ".mov", ".mkv", ".m4v", ".wmv")
+
+
+class VideoFileSource:
+    """录像回放源：单个视频文件或目录下的所有视频（按文件名排序）。
+
+    stride > 1 时跳过的帧只 grab() 不解码；时间戳取自视频流本身而不是
+    time.time()，多文件时依次累加，保证单调。speed=0 时尽快回放，
+    speed=1 按实时速度，其他值为倍速。
+    """
+
+    def __init__(self, path, stride=1, speed=0):
+        if os.path.isdir(path):
+            self.files = sorted(os.path.join(path, f) for f in os.listdir(path) if f.lower().endswith(VIDEO_EXTS))
+        else:
+            self.files = [path]
+        if not self.files:
+            raise FileNotFoundError(f"找不到视频文件: {path}")
+        self.stride = max(1, int(stride))
+        self.speed = speed
+        self.cap = None
+        self.file_idx = -1
+        self.offset_s = 0.0     # 之前文件的总时长
+        self.last_ts = 0.0
+        self.frame_pos = 0      # 当前文件内的帧号
+        self.frame_id = 0
+        self.dropped = 0        # 因 stride 跳过的帧数
+        self.wall_start = None
+        self.stream_fps = 30
+        self._open_next()
+        self.fps = self.stream_fps / self.stride  # 有效处理帧率
+
+    def _open_next(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.offset_s = self.last_ts
+        self.file_idx += 1
+        if self.file_idx >= len(self.files):
+            self.cap = None
+            return False
+        self.cap = cv2.VideoCapture(self.files[self.file_idx])
+        if not self.cap.isOpened():
+            print(f"无法打开视频文件: {self.files[self.file_idx]}")
+            return self._open_next()
+        self.stream_fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
+        self.frame_pos = 0
+        print(f"开始回放: {self.files[self.file_idx]} ({self.stream_fps:.1f} fps, stride={self.stride})")
+        return True
+
+    @property
+    def finished(self):
+        """所有文件都已读完"""
+        return self.cap is None
+
+    def _stream_ts(self):
+        pos_ms = self.cap.get(cv2.CAP_PROP_POS_MSEC)
+        if pos_ms and pos_ms > 0:
+            return pos_ms / 1000.0
+        return self.frame_pos / self.stream_fps  # 部分编码格式不提供时间戳
+
+    def read(self, timeout=None):
+        """返回 (ok, frame, ts)，ts 为视频流时间（秒）"""
+        while self.cap is not None:
+            for _ in range(self.stride - 1):
+                if not self.cap.grab():
+                    break
+                self.frame_pos += 1
+                self.dropped += 1
+            ok, frame = self.cap.read()
+            if ok:
+                self.frame_pos += 1
+                self.frame_id += 1
+                ts = self.offset_s + self._stream_ts()
+                # 部分格式时间戳不可靠，保证单调
+                ts = max(ts, self.last_ts)
+                self.last_ts = ts
+                self._pace(ts)
+                return True, frame, ts
+            self._open_next()
+        return False, None, None
+
+    def _pace(self, ts):
+        if not self.speed:
+            return
+        if self.wall_start is None:
+            self.wall_start = time.monotonic() - ts / self.speed
+        delay = self.wall_start + ts / self.speed - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def stats(self):
+        return {"grabbed": self.frame_id, "dropped": self.dropped}
+
+    def release(self):
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+
+def open_source(cfg):
+    """按配置打开视频源：摄像头（后台抓帧）或录像文件/目录"""
+    src_cfg = cfg.get("source", {})
+    if src_cfg.get("type", "camera") == "file":
+        return VideoFileSource(src_cfg["path"], stride=src_cfg.get("stride", 1), speed=src_cfg.get("speed", 0))
+    cam_cfg = cfg["camera"]
+    cap = cv2.VideoCapture(cam_cfg["index"])
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, cam_cfg["width"])
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, cam_cfg["height"])
+    cap.set(cv2.CAP_PROP_FPS, cam_cfg["fps"])
+    # 后台线程抓帧，消费端只处理最新一帧，避免摄像头缓冲积压
+    return FrameGrabber(cap, buffer_size=cam_cfg.get("buffer_size", 2), fps=cam_cfg["fps"]).start()
@@ -0,0 +1,129 @@
+# 检测结果的列式存储 - 用 NumPy 数组代替逐框的 dict 列表
+import numpy as np
+
+
+class Detections:
+    """一帧的检测结果。
+
+    xyxy:   (N, 4) float32 框坐标
+    conf:   (N,)   float32 置信度
+    cls_id: (N,)   int32   类别 id，名称通过 names[cls_id] 查询
+    names:  类别名称元组（整个运行期间共享同一个对象）
+    track_id: (N,) int64 跟踪 id，经过 tracker 后才有，否则为 None
+
+    迭代时产出 {'name','xyxy','conf'} dict（有跟踪 id 时多一个 'track_id'），兼容旧的逐框处理代码。
+    """
+
+    __slots__ = ("xyxy", "conf", "cls_id", "names", "track_id")
+
+    def __init__(self, xyxy, conf, cls_id, names=(), track_id=None):
+        self.xyxy = np.asarray(xyxy, dtype=np.float32).reshape(-1, 4)
+        self.conf = np.asarray(conf, dtype=np.float32).reshape(-1)
+        self.cls_id = np.asarray(cls_id, dtype=np.int32).reshape(-1)
+        self.names = names
+        self.track_id = None if track_id is None else np.asarray(track_id, dtype=np.int64).reshape(-1)
+
+    @classmethod
+    def empty(cls, names=()):
+        return cls(np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int32), names)
+
+    @classmethod
+    def from_result(cls, res, names=None):
+        """从 ultralytics Results 一次性转换（一次 GPU->CPU 拷贝）"""
+        if names is None:
+            names = tuple(res.names[i] for i in range(len(res.names)))
+        boxes = res.boxes
+        if boxes is None or len(boxes) == 0:
+            return cls.empty(names)
+        data = boxes.data
+        if hasattr(data, "cpu"):
+            data = data.cpu().numpy()
+        # data 每行为 x1, y1, x2, y2, conf, cls（跟踪模式下 cls 前多一列 id）
+        return cls(data[:, :4], data[:, -2], data[:, -1], names)
+
+    @classmethod
+    def from_dicts(cls, dets, names):
+        """从旧的 [{'name','xyxy','conf'}] 列表构造，names 须包含所有出现的名称"""
+        index = {n: i for i, n in enumerate(names)}
+        if not dets:
+            return cls.empty(names)
+        return cls([d["xyxy"] for d in dets], [d["conf"] for d in dets], [index[d["name"]] for d in dets], names)
+
+    @classmethod
+    def concat(cls, items, names=None):
+        items = list(items)
+        if names is None:
+            names = items[0].names if items else ()
+        if not items:
+            return cls.empty(names)
+        track_id = None
+        if all(d.track_id is not None for d in items):
+            track_id = np.concatenate([d.track_id for d in items])
+        return cls(np.concatenate([d.xyxy for d in items]), np.concatenate([d.conf for d in items]),
+                   np.concatenate([d.cls_id for d in items]), names, track_id)
+
+    def __len__(self):
+        return len(self.conf)
+
+    def __getitem__(self, index):
+        """按布尔掩码或下标数组取子集"""
+        track_id = None if self.track_id is None else self.track_id[index]
+        return Detections(self.xyxy[index], self.conf[index], self.cls_id[index], self.names, track_id)
+
+    def __iter__(self):
+        for i, (box, conf, cls_id) in enumerate(zip(self.xyxy.tolist(), self.conf.tolist(), self.cls_id.tolist())):
+            d = {"name": self.names[cls_id], "xyxy": box, "conf": conf}
+            if self.track_id is not None:
+                d["track_id"] = int(self.track_id[i])
+            yield d
+
+    def __repr__(self):
+        return f"Detections(n={len(self)})"
+
+    def to_dicts(self):
+        return list(self)
+
+    def name_list(self):
+        names = self.names
+        return [names[i] for i in self.cls_id.tolist()]
+
+    def class_counts(self):
+        """每个类别 id 的框数，长度为 len(names)"""
+        return np.bincount(self.cls_id, minlength=len(self.names))
+
+    def centers(self):
+        return (self.xyxy[:, :2] + self.xyxy[:, 2:]) * 0.5
+
+    def shift(self, dx, dy):
+        """平移坐标（裁剪区域推理后映射回整帧坐标）"""
+        if dx or dy:
+            self.xyxy += np.array([dx, dy, dx, dy], dtype=np.float32)
+        return self
+
+
+def nms(xyxy, conf, iou_thres=0.5, max_det=300):
+    """贪心 NMS，返回保留框的下标（按置信度降序）"""
+    order = np.argsort(-conf, kind="stable")
+    areas = (xyxy[:, 2] - xyxy[:, 0]).clip(0) * (xyxy[:, 3] - xyxy[:, 1]).clip(0)
+    keep = []
+    while order.size and len(keep) < max_det:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        xx1 = np.maximum(xyxy[i, 0], xyxy[rest, 0])
+        yy1 = np.maximum(xyxy[i, 1], xyxy[rest, 1])
+        xx2 = np.minimum(xyxy[i, 2], xyxy[rest, 2])
+        yy2 = np.minimum(xyxy[i, 3], xyxy[rest, 3])
+        inter = (xx2 - xx1).clip(0) * (yy2 - yy1).clip(0)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_thres]
+    return np.asarray(keep, dtype=np.int64)
+
+
+def batched_nms(xyxy, conf, cls_id, iou_thres=0.5, max_det=300):
+    """按类别分别做 NMS（不同类别的框互不抑制），返回保留框的下标"""
+    if len(conf) == 0:
+        return np.zeros(0, dtype=np.int64)
+    # 按类别平移坐标，使不同类别的框不可能重叠
+    offset = cls_id.astype(np.float32)[:, None] * (float(xyxy.max()) + 1.0)
+    return nms(xyxy + offset, conf, iou_thres, max_det)
@@ -1,8 +1,14 @@
 # Ultralytics YOLOE 检测器封装
-from ultralytics import YOLOE
 import os
-import cv2
+import numpy as np
 import sys
+from aggregator import SlidingCounter
+from detections import Detections
+from metrics import Metrics
+from onnx_backend import OnnxBackend
+from preprocess import Prepared, Preprocessor, load_preprocessor, restore_boxes
+from tiling import load_tiler
+from text_embed_cache import DEFAULT_CACHE_DIR, load_ensemble_pe, load_prompt_groups, set_classes_cached
 
 # 添加CLIP库路径
 clip_path = "D:\\portfolio\\table-scenes\\CLIP-main"
@@ -14,79 +20,56 @@ else:
     exit(1)
 
 
+def load_yoloe(model_path, box_only=False):
+	"""加载 YOLOE 权重。
+
+	box_only 时把 *-seg.pt 的权重装入同规模的检测结构（yoloe-11l-seg.pt -> yoloe-11l.yaml），
+	不再构建掩码原型和掩码系数分支，推理和导出都不做掩码计算。
+	"""
+	from ultralytics import YOLOE
+
+	name = os.path.basename(model_path)
+	if box_only and "-seg" in name:
+		det_cfg = os.path.splitext(name.replace("-seg", ""))[0] + ".yaml"
+		try:
+			model = YOLOE(det_cfg).load(model_path)
+			print(f"仅检测框模式: {det_cfg} <- {model_path}")
+			return model
+		except Exception as e:
+			print(f"警告: 无法构建检测结构 {det_cfg} ({e})，仍使用分割模型")
+	return YOLOE(model_path)
+
+
 class YoloDetector:
-	def __init__(self, model_cfg, classes):
+	def __init__(self, model_cfg, classes, metrics=None):
 		print("model_cfg:", model_cfg)  # 调试用
-		
-		# 检查模型文件是否存在
-		model_path = model_cfg["weights"]
-		if not os.path.exists(model_path):
-			print(f"错误: 模型文件 {model_path} 不存在!")
-			raise FileNotFoundError(f"找不到 YOLOE 模型文件: {model_path}")
-		
-		self.model = YOLOE(model_path)
+		self.metrics = metrics if metrics is not None else Metrics(enabled=False)
 		self.imgsz = model_cfg.get("imgsz", 640)
 		self.conf = model_cfg.get("conf", 0.4)  # 使用 YOLOE 默认置信度阈值
 		self.iou = model_cfg.get("iou", 0.5)
+		self.batch_size = max(1, model_cfg.get("batch_size", 8))  # infer_batch 单次 predict 的最大帧数
+		self.verbose = model_cfg.get("verbose", False)  # 逐帧打印检测结果
+		self.names = None  # 类别名称元组，首帧时从结果中取得并在之后共享
 		
-		# 为筷子创建更丰富的描述集合，提高识别率
-		chopsticks_descriptions = [
-			"chopsticks", 
-			"wooden chopsticks", 
-			"bamboo chopsticks", 
-			"wooden eating utensils",
-			"long thin wooden sticks for eating", 
-			"asian eating utensils",
-			"chinese chopsticks",
-			"japanese chopsticks", 
-			"korean chopsticks",
-			"black chopsticks",
-			"pair of thin wooden sticks",
-			"traditional asian eating tools",
-			"wooden rods used for eating",
-			"slender wooden eating implements",
-			"straight thin wooden sticks used in asian cuisine"
-		]
-
-		# 为扑克牌创建更丰富的描述集合，提高识别率
-		poker_descriptions = [
-			"poker", 
-			"playing cards",
-			"deck of cards",
-			"poker cards", 
-			"playing card deck",
-			"card game",
-			"card deck",
-			"cards for gambling",
-			"casino cards",
-			"rectangular paper cards with numbers and suits",
-			"hearts spades clubs diamonds cards",
-			"face cards",
-			"poker game cards",
-			"bridge cards",
-			"standard 52-card deck",
-			"playing card set",
-			"gaming cards"
-		]
-
-		# 标准物体类别
-		standard_objects = [
-			"person", "keyboard", "mouse", "laptop", "book",
-			"cup", "wine glass", "fork", "spoon", "knife", "bowl", 
-			"dining table", "cell phone", "remote", "scissors",
-			"chair", "bottle", "chess board", "board game pieces"
-		]
-		
-		# 构建丰富的类别描述列表
-		all_classes = standard_objects.copy()
-		all_classes.extend(poker_descriptions)
-		all_classes.extend(chopsticks_descriptions)
-		print(f"构建了 {len(all_classes)} 个类别描述")
-		
-		# 按照官方用法设置类别和文本嵌入
-		print("设置增强的类别描述...")
-		self.model.set_classes(all_classes)
-		print("类别描述设置完成")
+		# 推理后端：torch（ultralytics YOLOE）或 onnx（onnxruntime 运行导出的模型）
+		self.backend = model_cfg.get("backend", "torch")
+		self.onnx = None
+		if self.backend == "onnx":
+			onnx_cfg = model_cfg.get("onnx", {})
+			self.onnx = OnnxBackend(
+				onnx_cfg["weights"], imgsz=self.imgsz, conf=self.conf, iou=self.iou,
+				intra_op_threads=onnx_cfg.get("intra_op_threads", 0),
+				inter_op_threads=onnx_cfg.get("inter_op_threads", 0),
+				names_file=onnx_cfg.get("names_file"), metrics=self.metrics)
+			self.names = self.onnx.names
+		else:
+			self._load_torch_model(model_cfg)
+		# 缩放 + 亮度/对比度查找表，写入复用缓冲区（ONNX 固定输入时直接 letterbox 到输入尺寸）
+		self.pre = load_preprocessor(model_cfg, letterbox=self.onnx is not None,
+		                             shape=self.onnx.shape if self.onnx is not None else None)
+		# 可选的分块推理（小物体），分块在推理线程内预处理并立即使用
+		self.tiler = load_tiler(model_cfg, normalize=SlidingCounter().normalize_detection_name)
+		self.tile_pre = None
 		
 		# 为了兼容性，仍然处理传入的类别
 		if isinstance(classes, dict):
@@ -96,40 +79,129 @@ class YoloDetector:
 		print(f"可识别的类别: {class_names[:10]}...")
 		self.classes = set(class_names)
 
-	def infer(self, frame):
-		# 图像预处理
-		# 1. 调整亮度对比度
-		alpha = 1.2  # 对比度增强因子
-		beta = 10    # 亮度增强因子
-		enhanced_frame = cv2.convertScaleAbs(frame, alpha=alpha, beta=beta)
+	def _load_torch_model(self, model_cfg):
+		# 检查模型文件是否存在
+		model_path = model_cfg["weights"]
+		if not os.path.exists(model_path):
+			print(f"错误: 模型文件 {model_path} 不存在!")
+			raise FileNotFoundError(f"找不到 YOLOE 模型文件: {model_path}")
 		
-		# 使用 YOLOE 模型进行预测
-		results = self.model.predict(enhanced_frame, conf=self.conf, iou=self.iou, verbose=False)
-		res = results[0]
-		out = []
+		# box_only: 只用检测框（ROI、聚合、绘制都不读掩码），去掉分割头
+		self.box_only = model_cfg.get("box_only", False)
+		self.model = load_yoloe(model_path, box_only=self.box_only)
 		
-		# 调试：查看所有检测结果
-		all_detections = []
-		for i, b in enumerate(res.boxes):
-			cls_id = int(b.cls)
-			name = res.names[cls_id]
-			confidence = float(b.conf)
-			all_detections.append(f"{name} ({confidence:.2f})")
+		# 类别描述（标准物体 + 扑克牌、筷子等的多种描述变体）在 YAML 中配置
+		groups = load_prompt_groups(model_cfg.get("prompts", "config/prompts.yaml"))
+		cache_dir = model_cfg.get("text_pe_cache", DEFAULT_CACHE_DIR)
 		
-		if all_detections:
-			print(f"检测到: {', '.join(all_detections)}")
+		# 按照官方用法设置类别和文本嵌入
+		# 文本嵌入按 (权重哈希, 描述列表) 缓存到磁盘，命中时跳过文本编码器
+		if model_cfg.get("collapse_prompts", False):
+			# 每组变体的嵌入取平均合并为一个规范类别，减少输出类别数和 NMS 候选框
+			names, pe = load_ensemble_pe(self.model, model_path, groups, cache_dir)
+			print(f"合并描述变体: {sum(len(v) for v in groups.values())} 个描述 -> {len(names)} 个类别")
+			self.model.set_classes(names, pe)
 		else:
-			print("未检测到任何物体")
-		
-		# 处理检测结果，转换为标准格式
-		for i, b in enumerate(res.boxes):
-			name = res.names[int(b.cls)]
-			
-			# 添加所有检测到的物体（它们已经是我们请求检测的类别）
-			out.append({
-				"name": name, 
-				"xyxy": b.xyxy[0].tolist(), 
-				"conf": float(b.conf)
-			})
+			all_classes = [v for vs in groups.values() for v in vs]
+			print(f"构建了 {len(all_classes)} 个类别描述")
+			print("设置增强的类别描述...")
+			set_classes_cached(self.model, model_path, all_classes, cache_dir)
+		print("类别描述设置完成")
+
+	def preprocess(self, frame, crop=None):
+		# 图像预处理：可选裁剪到 ROI 外接矩形，先缩放到 imgsz，再调整亮度对比度（model.preprocess.alpha / beta）
+		# 返回 Prepared，其中的图像缓冲区会轮换复用
+		with self.metrics.timer("preprocess"):
+			return self.pre(frame, crop)
+
+	def infer(self, frame, crop=None):
+		return self.predict(self.preprocess(frame, crop))
+
+	def predict(self, prep):
+		# prep 为 preprocess 的输出；直接传入图像时按原图推理
+		if not isinstance(prep, Prepared):
+			if self.onnx is not None:
+				return self._log(self.onnx.infer(prep))
+			prep = Prepared(prep, 1.0, (0, 0), prep.shape[:2])
+		if self.onnx is not None:
+			return self._log(self.onnx.infer_prepared(prep))
+		# 使用 YOLOE 模型进行预测
+		results = self.model.predict(prep.image, conf=self.conf, iou=self.iou, verbose=False)
+		self._record_speed(results[0])
+		with self.metrics.timer("convert"):
+			return self._log(restore_boxes(self._convert(results[0]), prep))
+
+	def infer_batch(self, frames, crops=None):
+		"""多帧批量推理（多摄像头、离线目录评分、录像回放），返回每帧的检测结果列表
+
+		frames 可以是帧列表，也可以是 (N, H, W, 3) 的数组；
+		crops 为每帧的裁剪区域（None 表示整帧），结果均为整帧坐标；
+		超过 batch_size 时按 batch_size 分块，每块一次 predict。
+		"""
+		if isinstance(frames, np.ndarray):
+			frames = list(frames) if frames.ndim == 4 else [frames]
+		if crops is None:
+			crops = [None] * len(frames)
+		if self.onnx is not None:
+			# 导出的 ONNX 模型输入固定为单帧
+			return [self.infer(f, c) for f, c in zip(frames, crops)]
+		out = []
+		for start in range(0, len(frames), self.batch_size):
+			end = start + self.batch_size
+			preps = [self.preprocess(f, c) for f, c in zip(frames[start:end], crops[start:end])]
+			results = self.model.predict([p.image for p in preps], conf=self.conf, iou=self.iou, verbose=False)
+			for res, prep in zip(results, preps):
+				self._record_speed(res)
+				with self.metrics.timer("convert"):
+					out.append(self._log(restore_boxes(self._convert(res), prep)))
+		return out
+
+	def infer_tiles(self, frame, crop=None):
+		"""整帧（或 ROI 裁剪区域）切成重叠小块，作为一个批次推理
+
+		返回整帧坐标的 Detections，只含 tiling.classes 中的类别。
+		"""
+		rects = self.tiler.rects(frame.shape, crop)
+		if self.tile_pre is None or self.tile_pre.n_buffers < len(rects):
+			# 分块在本次调用内用完，缓冲区个数等于块数即可
+			pre = self.pre
+			self.tile_pre = Preprocessor(pre.shape, alpha=pre.alpha, beta=pre.beta, letterbox=pre.letterbox,
+			                             n_buffers=len(rects))
+		with self.metrics.timer("tile_preprocess"):
+			preps = [self.tile_pre(frame, r) for r in rects]
+		if self.onnx is not None:
+			parts = [self.onnx.infer_prepared(p) for p in preps]
+		else:
+			results = self.model.predict([p.image for p in preps], conf=self.conf, iou=self.iou, verbose=False)
+			parts = [restore_boxes(self._convert(res), p) for res, p in zip(results, preps)]
+		return self.tiler.select(Detections.concat(parts, self.names))
+
+	def refine_tiled(self, dets, frame, crop=None):
+		"""在整帧结果上补充分块检测到的小物体，按类别 NMS 合并"""
+		tiles = self.infer_tiles(frame, crop)
+		with self.metrics.timer("tile_merge"):
+			return self._log(self.tiler.merge(dets, tiles))
+
+	def _record_speed(self, res):
+		# ultralytics 在结果中记录了各步骤耗时（毫秒，批量时为单帧均摊）
+		speed = getattr(res, "speed", None) or {}
+		for key, name in (("preprocess", "model_preprocess"), ("inference", "model_forward"), ("postprocess", "postprocess")):
+			if speed.get(key) is not None:
+				self.metrics.observe(name, speed[key] / 1000.0)
+
+	def _convert(self, res):
+		# 结果张量一次性转换为列式 Detections，不再逐框构造 dict
+		if self.names is None:
+			self.names = tuple(res.names[i] for i in range(len(res.names)))
+		return Detections.from_result(res, self.names)
+
+	def _log(self, dets):
+		# 调试：查看所有检测结果
+		if self.verbose:
+			if len(dets):
+				items = [f"{name} ({conf:.2f})" for name, conf in zip(dets.name_list(), dets.conf.tolist())]
+				print(f"检测到: {', '.join(items)}")
+			else:
+				print("未检测到任何物体")
 		
-		return out
\ No newline at end of file
+		return dets
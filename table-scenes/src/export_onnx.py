@@ -0,0 +1,52 @@
+"""
+导出 ONNX 检测模型
+
+按 config.yaml 的 model 配置构建 YoloDetector（包括类别描述和文本嵌入），
+再导出为 ONNX，供 model.backend: onnx 和 quantize_model.py 使用。
+默认导出仅检测框的变体（不含掩码原型和掩码系数输出），--with-masks 导出完整分割模型。
+
+用法（在项目根目录运行）:
+    python src/export_onnx.py --out models/yoloe-11l-det.onnx
+    python src/export_onnx.py --with-masks --out models/yoloe-11l-seg.onnx
+"""
+
+import argparse
+import json
+import os
+import shutil
+
+import yaml
+
+from detector import YoloDetector
+
+
+def main():
+    parser = argparse.ArgumentParser(description="导出 ONNX 检测模型")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--classes", default="config/classes_coco.yaml")
+    parser.add_argument("--out", default=os.path.join("models", "yoloe-det.onnx"))
+    parser.add_argument("--with-masks", action="store_true", help="导出完整分割模型")
+    parser.add_argument("--opset", type=int, default=None)
+    args = parser.parse_args()
+
+    cfg = yaml.safe_load(open(args.config, encoding="utf-8"))
+    classes = yaml.safe_load(open(args.classes, encoding="utf-8"))["names"]
+    model_cfg = dict(cfg["model"], backend="torch", box_only=not args.with_masks)
+    det = YoloDetector(model_cfg, classes)
+
+    path = det.model.export(format="onnx", imgsz=det.imgsz, simplify=True, dynamic=False, opset=args.opset)
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    if os.path.abspath(path) != os.path.abspath(args.out):
+        shutil.move(path, args.out)
+
+    # 类别名称另存一份，模型元数据缺失时由 model.onnx.names_file 使用
+    names = [det.model.names[i] for i in sorted(det.model.names)]
+    names_file = os.path.splitext(args.out)[0] + ".names.json"
+    with open(names_file, "w", encoding="utf-8") as f:
+        json.dump(names, f, ensure_ascii=False)
+    print(f"已导出: {args.out} ({'分割' if args.with_masks else '仅检测框'}, {len(names)} 个类别)")
+    print(f"类别名称: {names_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+# 性能指标 - 各阶段延迟直方图，本地 HTTP 端点输出 Prometheus 文本格式
+import bisect
+import contextlib
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# 直方图桶上界（秒）：50us ~ 约 30s，按 1.25 倍等比递增
+_BUCKETS = tuple(50e-6 * 1.25 ** i for i in range(60))
+
+
+class LatencyHistogram:
+    """固定桶的延迟直方图，分位数在桶内线性插值估计"""
+
+    def __init__(self, bounds=_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # 最后一个桶为 +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lo = self.bounds[i - 1] if i > 0 else 0.0
+                hi = self.bounds[i] if i < len(self.bounds) else self.max
+                return min(lo + (hi - lo) * (rank - seen) / n, self.max)
+            seen += n
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": self.sum / self.count * 1000 if self.count else 0.0,
+            "p50_ms": self.quantile(0.50) * 1000,
+            "p95_ms": self.quantile(0.95) * 1000,
+            "p99_ms": self.quantile(0.99) * 1000,
+            "max_ms": self.max * 1000,
+        }
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "t0")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.t0)
+        return False
+
+
+class Metrics:
+    """指标注册表：按阶段名记录延迟，另有若干瞬时值 (gauge)。
+
+    enabled=False 时所有记录操作为空操作，可以无条件调用。
+    """
+
+    def __init__(self, enabled=True, prefix="table_scenes"):
+        self.enabled = enabled
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.gauges = {}
+        self.collectors = []  # 导出前调用，用于刷新 gauge
+        self.started = time.time()
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self.lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = LatencyHistogram()
+            hist.observe(seconds)
+
+    def timer(self, name):
+        """with metrics.timer('stage'): ... 记录代码块耗时"""
+        if not self.enabled:
+            return contextlib.nullcontext()
+        return _Timer(self, name)
+
+    def set_gauge(self, name, value, **labels):
+        if not self.enabled:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.gauges[key] = float(value)
+
+    def add_collector(self, fn):
+        self.collectors.append(fn)
+
+    def _collect(self):
+        for fn in self.collectors:
+            try:
+                fn(self)
+            except Exception as e:
+                print(f"指标采集出错: {e}")
+
+    def to_dict(self):
+        self._collect()
+        with self.lock:
+            stages = {name: h.summary() for name, h in self.histograms.items()}
+            gauges = {
+                name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else ""): value
+                for (name, labels), value in self.gauges.items()
+            }
+        return {"uptime_s": time.time() - self.started, "stages": stages, "gauges": gauges}
+
+    def to_prometheus(self):
+        """Prometheus 文本格式"""
+        self._collect()
+        p = self.prefix
+        lines = [
+            f"# HELP {p}_stage_latency_seconds Per-stage latency.",
+            f"# TYPE {p}_stage_latency_seconds histogram",
+        ]
+        with self.lock:
+            items = sorted(self.histograms.items())
+            for name, h in items:
+                cum = 0
+                for bound, n in zip(h.bounds, h.counts):
+                    cum += n
+                    if n:  # 省略空桶，累计值不受影响
+                        lines.append(f'{p}_stage_latency_seconds_bucket{{stage="{name}",le="{bound:.6g}"}} {cum}')
+                lines.append(f'{p}_stage_latency_seconds_bucket{{stage="{name}",le="+Inf"}} {h.count}')
+                lines.append(f'{p}_stage_latency_seconds_sum{{stage="{name}"}} {h.sum:.9f}')
+                lines.append(f'{p}_stage_latency_seconds_count{{stage="{name}"}} {h.count}')
+            lines.append(f"# HELP {p}_stage_latency_quantile_seconds Estimated latency quantiles.")
+            lines.append(f"# TYPE {p}_stage_latency_quantile_seconds gauge")
+            for name, h in items:
+                for q in (0.5, 0.95, 0.99):
+                    lines.append(f'{p}_stage_latency_quantile_seconds{{stage="{name}",quantile="{q}"}} {h.quantile(q):.9f}')
+            seen = set()
+            for (name, labels), value in sorted(self.gauges.items()):
+                if name not in seen:
+                    seen.add(name)
+                    lines.append(f"# TYPE {p}_{name} gauge")
+                label_str = "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}" if labels else ""
+                lines.append(f"{p}_{name}{label_str} {value:.6g}")
+        return "\n".join(lines) + "\n"
+
+    def dump_json(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        print(f"性能指标已保存到: {path}")
+
+
+class MetricsServer:
+    """在 localhost 上提供 /metrics（Prometheus 文本）和 /metrics.json"""
+
+    def __init__(self, metrics, port=9108, host="127.0.0.1"):
+        metrics_ref = metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.startswith("/metrics.json"):
+                    body = json.dumps(metrics_ref.to_dict(), ensure_ascii=False).encode("utf-8")
+                    ctype = "application/json; charset=utf-8"
+                elif self.path.startswith("/metrics"):
+                    body = metrics_ref.to_prometheus().encode("utf-8")
+                    ctype = "text/plain; version=0.0.4; charset=utf-8"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", ctype)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass  # 不打印访问日志
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        host, port = self.server.server_address[:2]
+        print(f"性能指标端点: http://{host}:{port}/metrics")
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,111 @@
+# 运动门控 - 画面基本不变时跳过推理，复用上一次的检测结果
+import cv2
+import numpy as np
+
+
+class MotionGate:
+    """基于缩小灰度图帧差的廉价变化检测。
+
+    只比较 ROI 多边形内的像素；与上一次推理时的参考帧相比，
+    变化像素比例低于 min_changed_ratio 时跳过推理。
+    每 refresh_every 帧强制推理一次，避免长期复用旧结果。
+    """
+
+    def __init__(self, polygon=None, width=160, pixel_threshold=20, min_changed_ratio=0.01, refresh_every=30):
+        self.polygon = polygon
+        self.width = width
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_ratio = min_changed_ratio
+        self.refresh_every = max(1, refresh_every)
+        self.ref = None       # 上一次推理时的缩小灰度图
+        self.candidate = None # 判定需要推理、尚未 commit 的缩小灰度图
+        self.mask = None      # ROI 掩码（缩小尺寸）
+        self.mask_area = 0
+        self.since_refresh = 0
+        self.frames = 0
+        self.skipped = 0
+
+    def _small_gray(self, frame):
+        h, w = frame.shape[:2]
+        scale = self.width / w
+        small = cv2.resize(frame, (self.width, max(1, int(round(h * scale)))), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        gray = cv2.GaussianBlur(gray, (3, 3), 0)  # 抑制传感器噪声
+        if self.mask is None or self.mask.shape != gray.shape:
+            self._build_mask(gray.shape, scale)
+        return gray
+
+    def _build_mask(self, shape, scale):
+        if self.polygon is None:
+            self.mask = np.full(shape, 255, dtype=np.uint8)
+        else:
+            self.mask = np.zeros(shape, dtype=np.uint8)
+            poly = np.round(np.asarray(self.polygon, dtype=np.float32) * scale).astype(np.int32)
+            cv2.fillPoly(self.mask, [poly], 255)
+        self.mask_area = max(1, cv2.countNonZero(self.mask))
+
+    def changed_ratio(self, gray, ref=None):
+        """ROI 内变化像素所占比例"""
+        diff = cv2.absdiff(gray, self.ref if ref is None else ref)
+        _, moved = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+        moved = cv2.bitwise_and(moved, self.mask)
+        return cv2.countNonZero(moved) / self.mask_area
+
+    def prepare(self, frame):
+        """缩小灰度图；可在上游线程提前计算，再传给 should_infer(gray=...)"""
+        return self._small_gray(frame)
+
+    def would_infer(self, gray):
+        """只判断、不计数也不更新参考帧（流水线预处理阶段据此推测是否需要准备推理输入）"""
+        ref = self.ref
+        return ref is None or self.since_refresh + 1 >= self.refresh_every \
+            or self.changed_ratio(gray, ref) >= self.min_changed_ratio
+
+    def should_infer(self, frame=None, gray=None, commit=True):
+        """判断当前帧是否需要重新推理。
+
+        commit=False 时参考帧不立即推进，推理真正完成后调用 commit()；
+        推理请求被丢弃时参考帧仍是上一次实际推理的画面，下一帧会再次判定为变化。
+        """
+        self.frames += 1
+        if gray is None:
+            gray = self._small_gray(frame)
+        if self.would_infer(gray):
+            self.candidate = gray
+            if commit:
+                self.commit()
+            return True
+        self.since_refresh += 1
+        self.skipped += 1
+        return False
+
+    def commit(self):
+        """推理完成：参考帧推进到最近一次判定需要推理的画面"""
+        if self.candidate is not None:
+            self.ref, self.candidate = self.candidate, None
+            self.since_refresh = 0
+
+    @property
+    def skip_rate(self):
+        """跳过推理的帧占比 (0.0-1.0)"""
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def reset(self):
+        self.ref = self.candidate = None
+        self.since_refresh = 0
+
+
+def load_motion_gate(cfg_motion, cfg_roi=None):
+    """按配置创建运动门控，未启用时返回 None"""
+    if not cfg_motion or not cfg_motion.get("enabled", False):
+        return None
+    polygon = None
+    if cfg_roi and cfg_roi.get("enabled", False):
+        polygon = cfg_roi["polygon"]
+    return MotionGate(
+        polygon=polygon,
+        width=cfg_motion.get("width", 160),
+        pixel_threshold=cfg_motion.get("pixel_threshold", 20),
+        min_changed_ratio=cfg_motion.get("min_changed_ratio", 0.01),
+        refresh_every=cfg_motion.get("refresh_every", 30),
+    )
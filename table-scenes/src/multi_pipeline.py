@@ -0,0 +1,151 @@
+# 多摄像头流水线 - 多路画面合并为一次批量推理，每路独立维护 ROI、滑动窗口和场景状态
+import time
+
+import cv2
+from aggregator import load_window
+from capture import FrameGrabber
+from detections import Detections
+from detector import YoloDetector
+from motion import load_motion_gate
+from pipeline import _apply_scene_events, _update_scene
+from scene_rules import load_scene_rules
+from scene_state import load_scene_state
+from render import load_renderer
+from roi import load_crop, load_roi
+from tracker import load_tracker
+
+
+class CameraState:
+    """单路摄像头的独立状态"""
+
+    def __init__(self, name, cam_cfg, roi_cfg, window_cfg, motion_cfg, tracker_cfg=None, rules=None, viz_cfg=None):
+        self.name = name
+        self.roi_cfg = roi_cfg
+        cap = cv2.VideoCapture(cam_cfg["index"])
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, cam_cfg["width"])
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, cam_cfg["height"])
+        cap.set(cv2.CAP_PROP_FPS, cam_cfg["fps"])
+        self.grabber = FrameGrabber(cap, buffer_size=cam_cfg.get("buffer_size", 2)).start()
+        self.roi_fn = load_roi(roi_cfg)
+        self.crop = load_crop(roi_cfg)
+        self.n_infer = 0  # 推理次数，决定何时做分块推理
+        self.gate = load_motion_gate(motion_cfg, roi_cfg)
+        self.tracker, self.detect_interval = load_tracker(tracker_cfg)
+        self.n_frames = 0
+        self.static = False  # 最近一次门控检查判定画面静止
+        self.win = load_window(window_cfg, cam_cfg["fps"], unique=self.tracker is not None)
+        self.scene_sm = load_scene_state(window_cfg, rules)
+        self.last_dets = Detections.empty()
+        self.ts = None
+        self.ended = False
+        self.last_frame_t = time.monotonic()  # 最近一次拿到新帧的时刻，用于提示长时间无画面
+        self.stalled = False
+        # 每路一个窗口，按 viz.mode 绘制（headless 时为 None）
+        self.renderer = load_renderer(viz_cfg, roi_cfg, window=f"table-scenes-{name}")
+
+
+def _camera_configs(cfg):
+    """展开 cameras 列表，未指定的字段继承 camera / roi 段"""
+    out = []
+    for entry in cfg["cameras"]:
+        cam_cfg = dict(cfg["camera"])
+        cam_cfg.update({k: v for k, v in entry.items() if k not in ("name", "roi")})
+        name = entry.get("name", f"cam{cam_cfg['index']}")
+        out.append((name, cam_cfg, entry.get("roi", cfg["roi"])))
+    return out
+
+
+def run_multi_pipeline(cfg, classes, scene_change_callback=None):
+    # 所有摄像头共享同一个检测器（只加载一份权重）
+    det = YoloDetector(cfg["model"], classes)
+    rules = load_scene_rules(cfg.get("scene_rules"))  # 所有摄像头共用一套规则，文件修改后在线替换
+    cams = [CameraState(name, cam_cfg, roi_cfg, cfg["window"], cfg.get("motion"), cfg.get("tracker"), rules,
+                        cfg.get("viz"))
+            for name, cam_cfg, roi_cfg in _camera_configs(cfg)]
+    print(f"多摄像头模式: {[c.name for c in cams]}")
+
+    try:
+        while not all(c.ended for c in cams):
+            # 1. 非阻塞地取每路的最新一帧；暂时没有新帧的摄像头本轮跳过，不拖慢其他摄像头
+            frames = {}
+            for cam in cams:
+                if cam.ended:
+                    continue
+                ok, frame, frame_ts = cam.grabber.read(timeout=0)
+                if not ok:
+                    if cam.grabber.finished:
+                        print(f"[{cam.name}] 视频源结束")
+                        cam.ended = True
+                    elif not cam.stalled and time.monotonic() - cam.last_frame_t > 5:
+                        print(f"[{cam.name}] 超过 5 秒没有新画面，继续等待")
+                        cam.stalled = True
+                    continue
+                frames[cam.name] = frame
+                cam.ts = frame_ts
+                cam.last_frame_t, cam.stalled = time.monotonic(), False
+            if not frames:
+                time.sleep(0.005)  # 所有摄像头都没有新帧，等待下一帧
+                continue
+
+            # 2. 需要推理的画面合并为一次批量 predict（跳过检测间隔外和画面无变化的摄像头）
+            batch = []
+            for c in cams:
+                if c.name not in frames:
+                    continue
+                due = c.n_frames % c.detect_interval == 0
+                c.n_frames += 1
+                if due:
+                    c.static = c.gate is not None and not c.gate.should_infer(frames[c.name], commit=False)
+                    if not c.static:
+                        batch.append(c)
+            results = dict(zip((c.name for c in batch), det.infer_batch([frames[c.name] for c in batch], [c.crop for c in batch])))
+            for c in batch:
+                if c.gate is not None:
+                    c.gate.commit()  # 推理完成后门控参考帧才推进到本帧
+            for cam in cams:
+                if cam.name not in frames:
+                    continue
+                dets = results.get(cam.name)
+                if dets is not None:
+                    if det.tiler is not None and det.tiler.due(cam.n_infer):
+                        dets = det.refine_tiled(dets, frames[cam.name], cam.crop)
+                    cam.n_infer += 1
+                if cam.tracker is not None:
+                    # 没有检测的帧由卡尔曼预测推进轨迹
+                    dets = cam.tracker.step(dets, static=cam.static)
+                if dets is not None:
+                    cam.last_dets = dets
+
+            # 3. 每路独立聚合与场景判断
+            rules.check()
+            for cam in cams:
+                if cam.name not in frames:
+                    continue
+                dets = cam.last_dets
+                if cam.roi_fn:
+                    dets = cam.roi_fn.filter(dets)
+                counts = cam.win.update_and_sum(dets, cam.ts)
+                scene, events = _update_scene(cam.scene_sm, cam.win, counts, cam.ts)
+                print(f"[{cam.name}] 当前场景判断: {cam.scene_sm.decision}")
+
+                def callback(old_scene, new_scene, cam_name=cam.name):
+                    print(f"[{cam_name}] 场景变化: {old_scene} -> {new_scene}")
+                    if scene_change_callback:
+                        scene_change_callback(old_scene, new_scene)
+
+                _apply_scene_events(events, cam.win, callback, counts, prefix=f"[{cam.name}] ")
+
+                # 调试可视化（inline / threaded 按 viz.mode，headless 不绘制）
+                if cam.renderer is not None:
+                    cam.renderer.submit(frames[cam.name], dets, scene, counts)
+
+            if any(c.renderer is not None and c.renderer.quit_requested for c in cams):
+                break
+    finally:
+        for cam in cams:
+            stats = cam.grabber.stats()
+            print(f"[{cam.name}] 采集统计: 共抓取 {stats['grabbed']} 帧，丢弃 {stats['dropped']} 帧")
+            cam.grabber.release()
+            if cam.renderer is not None:
+                cam.renderer.stop()
+        cv2.destroyAllWindows()
@@ -0,0 +1,126 @@
+# ONNX Runtime 推理后端 - 运行导出的 YOLOE ONNX 模型，不依赖 torch/ultralytics
+import ast
+import json
+import os
+
+import cv2
+import numpy as np
+
+from detections import Detections, batched_nms
+from metrics import Metrics
+from preprocess import Prepared, restore_boxes
+
+
+def letterbox(img, new_shape=(640, 640), color=(114, 114, 114)):
+    """等比缩放并居中填充到 new_shape (h, w)，与 ultralytics 的 LetterBox 一致。
+
+    返回 (填充后的图像, 缩放比例, (左侧填充, 上方填充))。
+    """
+    h, w = img.shape[:2]
+    r = min(new_shape[0] / h, new_shape[1] / w)
+    new_w, new_h = int(round(w * r)), int(round(h * r))
+    dw, dh = (new_shape[1] - new_w) / 2, (new_shape[0] - new_h) / 2
+    if (w, h) != (new_w, new_h):
+        img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+    top, bottom = int(round(dh - 0.1)), int(round(dh + 0.1))
+    left, right = int(round(dw - 0.1)), int(round(dw + 0.1))
+    img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return img, r, (left, top)
+
+
+def to_blob(img, out=None):
+    """letterbox 后的 BGR HWC uint8 -> RGB NCHW float32 (0-1)
+
+    out 为预分配的 (1, 3, h, w) 缓冲区时原地写入。
+    """
+    if out is None:
+        out = np.empty((1, 3) + img.shape[:2], dtype=np.float32)
+    np.multiply(img[..., ::-1].transpose(2, 0, 1), 1 / 255.0, out=out[0], casting="unsafe")
+    return out
+
+
+def decode_predictions(pred, nc, conf_thres, iou_thres, max_det=300):
+    """解码 YOLO 原始输出 (4 + nc [+ 掩码系数], anchors)。
+
+    返回 letterbox 坐标系下的 (xyxy, conf, cls_id)，已做按类别 NMS。
+    """
+    scores = pred[4:4 + nc]                      # (nc, A)
+    cls_id = scores.argmax(axis=0)
+    conf = scores[cls_id, np.arange(scores.shape[1])]
+    keep = conf > conf_thres
+    if not keep.any():
+        return np.zeros((0, 4), np.float32), np.zeros(0, np.float32), np.zeros(0, np.int32)
+    cx, cy, w, h = pred[:4, keep]
+    xyxy = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    conf, cls_id = conf[keep], cls_id[keep]
+    idx = batched_nms(xyxy, conf, cls_id, iou_thres, max_det)
+    return xyxy[idx], conf[idx], cls_id[idx]
+
+
+def read_model_names(session, names_file=None):
+    """类别名称：优先读 ultralytics 导出时写入的元数据，其次读 names_file (JSON 列表)"""
+    meta = session.get_modelmeta().custom_metadata_map
+    if "names" in meta:
+        names = ast.literal_eval(meta["names"])  # 形如 "{0: 'person', 1: ...}"
+        return tuple(names[i] for i in sorted(names))
+    if names_file and os.path.exists(names_file):
+        return tuple(json.load(open(names_file, encoding="utf-8")))
+    raise ValueError("ONNX 模型中没有类别名称元数据，请配置 names_file")
+
+
+class OnnxBackend:
+    """onnxruntime CPU 推理。
+
+    输入缓冲区预先分配并通过 IO binding 绑定，每帧只做 letterbox 和归一化写入，
+    输出与 torch 路径相同（原图坐标系的 Detections）。
+    """
+
+    def __init__(self, model_path, imgsz=640, conf=0.4, iou=0.5, intra_op_threads=0, inter_op_threads=0,
+                 names_file=None, max_det=300, metrics=None):
+        import onnxruntime as ort
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"找不到 ONNX 模型文件: {model_path}")
+        so = ort.SessionOptions()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        so.intra_op_num_threads = intra_op_threads  # 0 表示由 onnxruntime 决定
+        so.inter_op_num_threads = inter_op_threads
+        if inter_op_threads > 1:
+            so.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        self.session = ort.InferenceSession(model_path, so, providers=["CPUExecutionProvider"])
+        self.metrics = metrics if metrics is not None else Metrics(enabled=False)
+        self.conf = conf
+        self.iou = iou
+        self.max_det = max_det
+        self.names = read_model_names(self.session, names_file)
+
+        inp = self.session.get_inputs()[0]
+        h, w = inp.shape[2:4]
+        if not isinstance(h, int) or not isinstance(w, int):
+            h = w = imgsz  # 动态输入尺寸
+        self.shape = (h, w)
+        # 预分配输入缓冲区并绑定，只取第一个输出（检测头；分割模型的掩码原型不需要）
+        self.input_buf = np.zeros((1, 3, h, w), dtype=np.float32)
+        self.io = self.session.io_binding()
+        self.io.bind_cpu_input(inp.name, self.input_buf)
+        self.io.bind_output(self.session.get_outputs()[0].name, "cpu")
+        print(f"ONNX 后端: {model_path} 输入 {w}x{h}, {len(self.names)} 个类别, "
+              f"intra_op={intra_op_threads} inter_op={inter_op_threads}")
+
+    def infer(self, frame):
+        """原始帧（未增强）-> Detections"""
+        with self.metrics.timer("model_preprocess"):
+            img, r, pad = letterbox(frame, self.shape)
+        return self.infer_prepared(Prepared(img, r, pad, frame.shape[:2]))
+
+    def infer_prepared(self, prep):
+        """Preprocessor(letterbox=True) 的输出 -> 原图坐标系的 Detections"""
+        with self.metrics.timer("model_preprocess"):
+            # 直接写入已绑定的输入缓冲区
+            to_blob(prep.image, out=self.input_buf)
+        with self.metrics.timer("model_forward"):
+            self.session.run_with_iobinding(self.io)
+            pred = self.io.copy_outputs_to_cpu()[0][0]
+        with self.metrics.timer("postprocess"):
+            xyxy, conf, cls_id = decode_predictions(pred, len(self.names), self.conf, self.iou, self.max_det)
+            return restore_boxes(Detections(xyxy, conf, cls_id, self.names), prep)
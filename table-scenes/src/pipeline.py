@@ -1,154 +1,242 @@
 # 串联 detector 和 scene_rules
-import cv2, time, yaml
-from aggregator import SlidingCounter
+import time, yaml
+from aggregator import load_window
+from capture import open_source
+from detections import Detections
 from detector import YoloDetector
-from scene_rules import decide_scene
-from roi import load_roi, draw_roi
-from viz import overlay_scene, overlay_counts, draw_detections
+from metrics import Metrics, MetricsServer
+from motion import load_motion_gate
+from scene_rules import load_scene_rules
+from scene_state import load_scene_state
+from render import load_renderer
+from roi import load_crop, load_roi
+from stages import Stage, StageGraph, format_stats
+from tracker import load_tracker
+
+
+def _update_scene(scene_sm, win, counts, ts):
+    """场景判断 + 状态机推进；多时间尺度窗口直接用类别计数向量打分"""
+    if hasattr(win, "vector"):
+        return scene_sm.update_vector(win.vector(), win.names, ts, win.get_buffer_fullness())
+    return scene_sm.update(counts, ts, win.get_buffer_fullness())
+
+
+def _apply_scene_events(events, win, scene_change_callback=None, counts=None, prefix=""):
+    """执行 SceneStateMachine 输出的事件：打印日志、重置滑动窗口，最后调用场景变化回调"""
+    changes = []
+    for ev in events:
+        old = ev.old if ev.old is not None else ""
+        if ev.kind == "hold":
+            print(f"{prefix}当前画面无物品，保持上一场景: {ev.old}")
+        elif ev.kind == "pending":
+            print(f"{prefix}场景可能变化: {ev.old} -> {ev.new}，开始确认...")
+        elif ev.kind == "vanishing":
+            print(f"{prefix}特征物品已消失，准备切换场景...")
+        elif ev.kind == "switch":
+            if ev.reason == "稳定":
+                print(f"{prefix}场景稳定切换: {old} -> {ev.new} | 物品: {dict(counts or {})}")
+            else:
+                print(f"{prefix}强特征物品({ev.reason})出现，立即切换场景: {old} -> {ev.new}")
+            changes.append((old, ev.new))
+        elif ev.kind == "reset":
+            win.reset()  # 重置滑动窗口，立即开始新场景的检测
+            if ev.old == ev.new:
+                print(f"{prefix}工作物品持续消失，重置检测窗口")
+            elif ev.reason == "稳定":
+                print(f"{prefix}重置检测历史，开始新场景统计")
+    if scene_change_callback:
+        for old, new in changes:
+            scene_change_callback(old, new)
 
 
 def run_pipeline(cfg_path="config/config.yaml", classes_path="config/classes_coco.yaml", scene_change_callback=None):
     cfg = yaml.safe_load(open(cfg_path, encoding="utf-8"))
     classes = yaml.safe_load(open(classes_path, encoding="utf-8"))["names"]
+    if cfg.get("cameras"):
+        # 多摄像头模式：跨摄像头批量推理
+        from multi_pipeline import run_multi_pipeline
+        return run_multi_pipeline(cfg, classes, scene_change_callback)
+    pipe_cfg = cfg.get("pipeline", {})
+    queue_size = pipe_cfg.get("queue_size", 2)
+    report_interval_s = pipe_cfg.get("report_interval_s", 5)
 
-    cap = cv2.VideoCapture(cfg["camera"]["index"])
-    cap.set(cv2.CAP_PROP_FRAME_WIDTH, cfg["camera"]["width"])
-    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, cfg["camera"]["height"])
-    cap.set(cv2.CAP_PROP_FPS, cfg["camera"]["fps"])
+    metrics_cfg = cfg.get("metrics", {})
+    metrics = Metrics(enabled=metrics_cfg.get("enabled", True))
 
-    det = YoloDetector(cfg["model"], classes)
+    # 摄像头（后台抓帧，只处理最新一帧）或录像文件回放
+    source = open_source(cfg)
+    # 实时摄像头只关心最新画面；录像回放不能丢帧
+    live = cfg.get("source", {}).get("type", "camera") != "file"
+
+    det = YoloDetector(cfg["model"], classes, metrics=metrics)
     roi_fn = load_roi(cfg["roi"])
-    win = SlidingCounter(seconds=cfg["window"]["seconds"], fps=cfg["camera"]["fps"])
+    crop = load_crop(cfg["roi"])  # 只对 ROI 外接矩形做推理
+    gate = load_motion_gate(cfg.get("motion"), cfg["roi"])
+    last_dets = Detections.empty()
+    # 跟踪器：检测器每 detect_interval 帧运行一次，其余帧由跟踪器推进；窗口按跟踪 id 计数
+    tracker, detect_interval = load_tracker(cfg.get("tracker"))
+    win = load_window(cfg["window"], source.fps, unique=tracker is not None)
+    # 场景规则：修改规则文件后在聚合阶段自动替换，无需重启重新加载模型
+    rules = load_scene_rules(cfg.get("scene_rules"))
+
+    # 场景状态机：迟滞确认、强特征立即切换，状态变化以事件形式返回
+    scene_sm = load_scene_state(cfg["window"], rules)
+    # 渲染器：None 表示 headless，不做任何绘制
+    renderer = load_renderer(cfg.get("viz"), cfg["roi"], metrics=metrics)
+    threaded_render = renderer is not None and renderer.mode == "threaded"
+
+    # 各阶段处理函数，数据以 dict 形式在阶段之间传递
+    stalled = False  # 已提示摄像头暂时没有新画面
+
+    def capture():
+        nonlocal stalled
+        # 读超时只是摄像头暂时没有新帧，继续等待；视频源真正结束时才结束流水线
+        while not source.finished:
+            with metrics.timer("capture_wait"):
+                ok, frame, frame_ts = source.read()
+            if ok:
+                stalled = False
+                return {"frame": frame, "ts": frame_ts}
+            if not stalled and not source.finished:
+                print("超过 5 秒没有新画面，继续等待")
+                stalled = True
+        return None
+
+    n_frames = 0    # 预处理阶段见到的帧数
+    n_arrived = 0   # 到达推理阶段的帧数
+    n_infer = 0     # 推理次数
+    static = False  # 最近一次门控检查判定画面静止（检测间隔内的帧沿用该结果）
 
-    last_scene, stable_since = None, 0
-    hysteresis_s = cfg["window"]["switch_hysteresis_s"]
+    def preprocess(item):
+        nonlocal n_frames
+        # 推测本帧是否需要推理，提前准备推理输入；推理阶段的输入队列会丢弃旧帧，
+        # 是否真正推理由推理阶段在实际到达的帧上决定
+        due = n_frames % detect_interval == 0
+        n_frames += 1
+        if gate is not None:
+            item["gray"] = gate.prepare(item["frame"])
+            due = due and gate.would_infer(item["gray"])
+        item["input"] = det.preprocess(item["frame"], crop) if due else None
+        return item
 
-    while True:
-        ok, frame = cap.read()
-        if not ok:
-            break
+    def infer(item):
+        nonlocal last_dets, n_arrived, n_infer, static
+        enhanced = item.pop("input")
+        gray = item.pop("gray", None)
+        # 检测间隔和运动门控按到达推理阶段的帧判断：被挤掉的帧不会带走推理请求或门控参考帧
+        due = n_arrived % detect_interval == 0
+        n_arrived += 1
+        if due:
+            static = gate is not None and not gate.should_infer(item["frame"], gray=gray, commit=False)
+        dets = None
+        if due and not static:
+            if enhanced is None:
+                enhanced = det.preprocess(item["frame"], crop)  # 预处理阶段推测错误时补做
+            dets = det.predict(enhanced)  # Detections
+            if gate is not None:
+                gate.commit()  # 推理完成后门控参考帧才推进到本帧
+            # 每 N 次推理在 ROI 区域上补充一次分块推理（小物体）
+            if det.tiler is not None and det.tiler.due(n_infer):
+                dets = det.refine_tiled(dets, item["frame"], crop)
+            n_infer += 1
+        if tracker is not None:
+            # 没有检测的帧由卡尔曼预测推进轨迹
+            with metrics.timer("tracking"):
+                tracked = tracker.step(dets, static=static)
+            if tracked is not None:
+                last_dets = tracked
+        elif dets is not None:
+            last_dets = dets
+        item["dets"] = last_dets
+        return item
 
-        dets = det.infer(frame)  # [{'name','xyxy','conf'}...]
+    def aggregate(item):
+        dets = item["dets"]
         if roi_fn:
-            dets = [d for d in dets if roi_fn(d["xyxy"])]
-        counts = win.update_and_sum([d["name"] for d in dets])
-        
+            with metrics.timer("roi_filter"):
+                dets = roi_fn.filter(dets)
+        with metrics.timer("aggregation"):
+            counts = win.update_and_sum(dets, item["ts"])
+
         # 打印每一帧中滑动窗口内的检测计数
         if any(counts.values()):
             print(f"当前检测计数: {dict(counts)}")
-            
-        scene = decide_scene(counts)
-        print(f"当前场景判断: {scene}")
-        
-        # 从counts中提取关键物品信息
-        has_poker = any(counts.get(term, 0) > 0 for term in [
-            "poker", "playing cards", "deck of cards", "poker cards", 
-            "card game", "card deck", "gaming cards"
-        ])
-        has_chopsticks = any(counts.get(term, 0) > 0 for term in [
-            "chopsticks", "wooden chopsticks", "bamboo chopsticks"
-        ])
-        has_work_items = any(counts.get(term, 0) > 0 for term in [
-            "laptop", "book", "mouse", "keyboard"
-        ])
-        has_dining_items = any(counts.get(term, 0) > 0 for term in [
-            "bowl", "cup", "wine glass", "spoon", "fork", "knife", "dining table"
-        ])
-        
-        # 检测当前画面中是否有任何物品
-        current_has_items = sum(counts.values()) > 0
-
-        # 检查场景变化
-        if scene != last_scene:
-            # 场景切换逻辑
-            # 1. 如果当前没有任何物品，可能是因为物品被移出画面，我们保持最后的场景
-            if not current_has_items and last_scene != 'nothing':
-                print(f"当前画面无物品，保持上一场景: {last_scene}")
-                scene = last_scene  # 保持上一个场景
-            else:
-                # 2. 对于有明确特征物品的场景变化，可以更快地切换
-                force_change = False
-                
-                # 特征物品优先级：扑克牌 > 工作物品 > 餐具+筷子
-                # 增加场景切换的敏感度，几乎所有场景变化都可以立即切换
-                if has_poker:
-                    force_change = True
-                    reason = "扑克牌"
-                elif has_work_items and scene == 'work':
-                    force_change = True
-                    reason = "工作物品"
-                elif has_dining_items and scene == 'dining':
-                    force_change = True
-                    reason = "餐饮物品"
-                # 对其他任何场景的变化也快速响应
-                elif scene != 'nothing' and last_scene != scene:
-                    force_change = True
-                    reason = "场景改变"
-                    reason = "餐具和筷子"
-                
-                # 处理场景切换
-                if force_change:
-                    print(f"强特征物品({reason})出现，立即切换场景: {last_scene} -> {scene}")
-                    win.reset()  # 重置滑动窗口，立即开始新场景的检测
-                    
-                    # 调用场景变化回调函数
-                    if scene_change_callback:
-                        old_scene = last_scene if last_scene is not None else ""
-                        scene_change_callback(old_scene, scene)
-                        
-                    last_scene = scene
-                    stable_since = 0
-                elif stable_since == 0:
-                    # 开始计时，记录新场景开始稳定的时间点
-                    stable_since = time.time()
-                    print(f"场景可能变化: {last_scene} -> {scene}，开始确认...")
-                elif time.time() - stable_since >= hysteresis_s:
-                    # 新场景已经稳定足够长的时间，确认切换
-                    print(f"场景稳定切换: {last_scene} -> {scene} | 物品: {dict(counts)}")
-                    # 检查是否需要重置滑动窗口
-                    buffer_fullness = win.get_buffer_fullness()
-                    if buffer_fullness > 0.7:  # 如果缓冲区已填充超过70%
-                        win.reset()  # 重置滑动窗口，避免历史检测结果影响新场景
-                        print("重置检测历史，开始新场景统计")
-                    
-                    # 调用场景变化回调函数
-                    if scene_change_callback:
-                        old_scene = last_scene if last_scene is not None else ""
-                        scene_change_callback(old_scene, scene)
-                        
-                    last_scene = scene
-                    stable_since = 0
-        else:
-            # 当前判断与上次场景相同，但需要处理特殊情况
-            
-            # 特殊情况：当前场景物品消失但有其他物品出现
-            if (last_scene == 'work' and not has_work_items and current_has_items) or \
-               (last_scene == 'dining' and not has_dining_items and current_has_items) or \
-               (last_scene == 'entertaining' and not has_poker and current_has_items):
-                # 几乎立即响应场景变化
-                if stable_since == 0:
-                    stable_since = time.time()
-                    print(f"特征物品已消失，准备切换场景...")
-                elif time.time() - stable_since >= hysteresis_s * 0.5:  # 非常快的切换
-                    print(f"工作物品持续消失，重置检测窗口")
-                    win.reset()  # 重置检测窗口，使系统能更快响应新场景
-                    stable_since = 0
-            else:
-                # 当前判断与上次场景相同，重置稳定时间
-                stable_since = 0
-
-        # 调试可视化
-        if cfg.get("viz", {}).get("enabled", True):
-            # 在画面中框出检测到的物体
-            draw_detections(frame, dets)
-            overlay_scene(frame, scene)
-            overlay_counts(frame, counts, max_items=cfg.get("viz", {}).get("max_items", 8))
-            draw_roi(frame, cfg["roi"])
-            cv2.imshow("table-scenes-s1", frame)
-            key = cv2.waitKey(1) & 0xFF
-            if key == 27 or key == ord('q'):
-                print("用户按下了q或ESC，程序退出")
+
+        with metrics.timer("scene_decision"):
+            rules.check()
+            scene, events = _update_scene(scene_sm, win, counts, item["ts"])
+            print(f"当前场景判断: {scene_sm.decision}")
+            _apply_scene_events(events, win, scene_change_callback, counts)
+            item["scene"] = scene
+        item["dets"], item["counts"] = dets, counts
+        if threaded_render:
+            renderer.submit(item["frame"], dets, item["scene"], counts)
+        if renderer is None or threaded_render:
+            del item["frame"]  # 主线程不再需要画面，尽早释放
+        return item
+
+    graph = StageGraph(capture, [
+        Stage("preprocess", preprocess, queue_size),
+        # 推理通常是瓶颈：输入队列只放一帧；实时摄像头丢弃排队的旧帧，总是推理最新画面
+        Stage("infer", infer, 1, drop_oldest=live),
+        Stage("aggregate", aggregate, queue_size),
+    ], sink_maxsize=queue_size, sink_name="render").start()
+
+    def collect(m):
+        # 导出前刷新瞬时指标：各阶段吞吐量/占用率、运动门控跳过率、采集丢帧
+        for st in graph.stats():
+            m.set_gauge("stage_throughput", st["throughput"], stage=st["name"])
+            m.set_gauge("stage_queue_occupancy", st["occupancy"], stage=st["name"])
+            m.set_gauge("stage_queue_age_ms", st["queue_age_ms"], stage=st["name"])
+            m.set_gauge("stage_dropped", st["dropped"], stage=st["name"])
+        if gate is not None:
+            m.set_gauge("motion_skip_rate", gate.skip_rate)
+        src_stats = source.stats()
+        m.set_gauge("frames_grabbed", src_stats["grabbed"])
+        m.set_gauge("frames_dropped", src_stats["dropped"])
+
+    metrics.add_collector(collect)
+    server = None
+    if metrics.enabled and metrics_cfg.get("port"):
+        try:
+            server = MetricsServer(metrics, port=metrics_cfg["port"]).start()
+        except OSError as e:
+            print(f"性能指标端点启动失败: {e}")
+
+    # inline 模式渲染在主线程进行（GUI 需要在主线程调用）
+    render_stats = graph.sink_stats
+    last_report = time.monotonic()
+    try:
+        while True:
+            item = graph.get()
+            if item is None:
                 break
 
-    cap.release()
-    cv2.destroyAllWindows()
\ No newline at end of file
+            t0 = time.perf_counter()
+            # 调试可视化
+            if renderer is not None:
+                if not threaded_render:
+                    renderer.submit(item["frame"], item["dets"], item["scene"], item["counts"])
+                if renderer.quit_requested:
+                    break
+            render_stats.record(time.perf_counter() - t0)
+
+            # 定期打印各阶段占用率和吞吐量，定位限制 FPS 的阶段
+            if report_interval_s and time.monotonic() - last_report >= report_interval_s:
+                last_report = time.monotonic()
+                print(f"阶段统计: {format_stats(graph.stats() + [render_stats.snapshot(graph.sink)])}")
+                if gate is not None:
+                    print(f"运动门控跳过率: {gate.skip_rate:.0%}")
+        if graph.error is not None:
+            raise graph.error
+    finally:
+        graph.stop()
+        stats = source.stats()
+        print(f"采集统计: 共抓取 {stats['grabbed']} 帧，丢弃 {stats['dropped']} 帧")
+        source.release()
+        if renderer is not None:
+            renderer.stop()
+        if server is not None:
+            server.stop()
+        if metrics.enabled and metrics_cfg.get("json_path"):
+            metrics.dump_json(metrics_cfg["json_path"])
@@ -0,0 +1,109 @@
+# 推理前预处理 - 先缩放再查表增强，写入复用的预分配缓冲区
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+# image: 缩放（letterbox 时含填充）并增强后的图像；scale: 缩放比例；
+# pad: (左侧填充, 上方填充)；shape: 原图 (h, w)；offset: 裁剪区域左上角在原图中的坐标
+Prepared = namedtuple("Prepared", "image scale pad shape offset", defaults=((0, 0),))
+
+
+def make_lut(alpha=1.2, beta=10):
+    """与 cv2.convertScaleAbs(x, alpha, beta) 逐像素等价的 256 项查找表"""
+    return cv2.convertScaleAbs(np.arange(256, dtype=np.uint8).reshape(1, 256), alpha=alpha, beta=beta)
+
+
+class Preprocessor:
+    """把帧缩放到模型输入尺寸，再用查找表做亮度/对比度增强。
+
+    原来在 1920x1080 原图上 convertScaleAbs，分配一张全分辨率新图后 ultralytics
+    还要再缩放、再分配一次。现在先缩放到 imgsz（像素数少约 5 倍），
+    增强通过 256 项查找表原地完成，结果写入轮换使用的预分配缓冲区。
+
+    letterbox=False: 按长边缩放到 imgsz，不填充（torch 路径，ultralytics 只需补齐步长）
+    letterbox=True:  缩放并居中填充到 shape (h, w)（ONNX 固定输入）
+    n_buffers: 缓冲区个数，须大于同时在用的帧数（批量大小 + 流水线队列中的帧）
+    """
+
+    def __init__(self, imgsz=640, alpha=1.2, beta=10, letterbox=False, n_buffers=4, pad_value=114):
+        self.shape = tuple(imgsz) if isinstance(imgsz, (tuple, list)) else (imgsz, imgsz)
+        self.alpha = alpha
+        self.beta = beta
+        self.lut = make_lut(alpha, beta)
+        self.identity = alpha == 1 and beta == 0
+        self.letterbox = letterbox
+        self.n_buffers = max(1, n_buffers)
+        self.pad_value = pad_value
+        self._pools = {}      # 输入尺寸 (h, w) -> [几何参数, 缓冲区列表, 下一个缓冲区下标]
+
+    def _geometry(self, h, w):
+        th, tw = self.shape
+        r = min(th / h, tw / w)
+        nw, nh = int(round(w * r)), int(round(h * r))
+        if not self.letterbox:
+            return r, nw, nh, 0, 0, nw, nh
+        left, top = int(round((tw - nw) / 2 - 0.1)), int(round((th - nh) / 2 - 0.1))
+        return r, nw, nh, left, top, tw, th
+
+    def _buffer(self, h, w):
+        pool = self._pools.get((h, w))
+        if pool is None:
+            # 每种输入尺寸（摄像头分辨率、裁剪区域）只分配一次
+            r, nw, nh, left, top, cw, ch = self._geometry(h, w)
+            bufs = [np.full((ch, cw, 3), self.pad_value, dtype=np.uint8) for _ in range(self.n_buffers)]
+            pool = self._pools[(h, w)] = [(r, nw, nh, left, top), bufs, 0]
+        geom, bufs, i = pool
+        pool[2] = (i + 1) % len(bufs)
+        return geom, bufs[i]
+
+    def __call__(self, frame, crop=None):
+        """crop: (x0, y0, x1, y1) 时只处理该区域（视图，不拷贝），框坐标由 restore_boxes 映射回整帧"""
+        shape = frame.shape[:2]
+        offset = (0, 0)
+        if crop is not None:
+            x0, y0, x1, y1 = crop
+            x0, y0 = max(0, int(x0)), max(0, int(y0))
+            x1, y1 = min(shape[1], int(x1)), min(shape[0], int(y1))
+            if x1 > x0 and y1 > y0:
+                frame = frame[y0:y1, x0:x1]
+                offset = (x0, y0)
+        (r, nw, nh, left, top), buf = self._buffer(*frame.shape[:2])
+        view = buf[top:top + nh, left:left + nw]
+        if (nw, nh) == frame.shape[1::-1]:
+            src = frame
+        else:
+            cv2.resize(frame, (nw, nh), dst=view, interpolation=cv2.INTER_LINEAR)
+            src = view
+        if not self.identity:
+            cv2.LUT(src, self.lut, dst=view)
+        elif src is frame:
+            view[...] = frame
+        return Prepared(buf, r, (left, top), shape, offset)
+
+
+def restore_boxes(dets, prep):
+    """把模型输入坐标系下的框映射回原图坐标（原地修改 dets.xyxy）"""
+    if len(dets) == 0 or (prep.scale == 1 and prep.pad == (0, 0) and prep.offset == (0, 0)):
+        return dets
+    xyxy = dets.xyxy
+    left, top = prep.pad
+    if left or top:
+        xyxy -= np.array([left, top, left, top], dtype=np.float32)
+    xyxy /= prep.scale
+    dx, dy = prep.offset
+    if dx or dy:
+        xyxy += np.array([dx, dy, dx, dy], dtype=np.float32)
+    h, w = prep.shape
+    np.clip(xyxy[:, 0::2], 0, w, out=xyxy[:, 0::2])
+    np.clip(xyxy[:, 1::2], 0, h, out=xyxy[:, 1::2])
+    return dets
+
+
+def load_preprocessor(model_cfg, letterbox=False, shape=None):
+    """按 model.preprocess 配置构建 Preprocessor"""
+    cfg = model_cfg.get("preprocess", {}) or {}
+    # 默认缓冲区数：一个批次 + 流水线中排队和正在处理的帧
+    n_buffers = cfg.get("buffers") or model_cfg.get("batch_size", 8) + 4
+    return Preprocessor(shape or model_cfg.get("imgsz", 640), alpha=cfg.get("alpha", 1.2), beta=cfg.get("beta", 10),
+                        letterbox=letterbox, n_buffers=n_buffers)
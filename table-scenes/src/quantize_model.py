@@ -0,0 +1,324 @@
+"""
+INT8 静态量化
+
+用项目自带的图片（data/yolo/images 和 data/raw）校准导出的 FP32 ONNX 检测模型，
+生成 INT8 模型，并在验证集上对比两者的精度（AP50、召回率、与 FP32 结果的一致性）
+和本机 CPU 延迟，报告保存为 JSON。
+
+生成的模型可直接由 YoloDetector 加载：
+    model.backend: onnx
+    model.onnx.weights: models/yoloe-det.int8.onnx
+
+用法（在项目根目录运行）:
+    python src/quantize_model.py models/yoloe-det.onnx
+    python src/quantize_model.py models/yoloe-det.onnx --per-channel --runs 100
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import re
+import time
+
+import cv2
+import numpy as np
+import yaml
+
+from aggregator import SlidingCounter
+from metrics import Metrics
+from onnx_backend import OnnxBackend, to_blob
+from preprocess import load_preprocessor
+
+CALIB_GLOBS = ["data/yolo/images/*/*.jpg", "data/raw/*.jpg"]
+
+
+def imread(path):
+    # cv2.imread 在 Windows 上不支持中文路径
+    return cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+class ImageCalibrationReader:
+    """onnxruntime CalibrationDataReader：逐张产出预处理后的输入"""
+
+    def __init__(self, paths, input_name, pre):
+        self.paths = list(paths)
+        self.input_name = input_name
+        self.pre = pre
+        self.it = iter(self.paths)
+
+    def get_next(self):
+        for p in self.it:
+            img = imread(p)
+            if img is None:
+                print(f"警告: 无法读取图片 {p}")
+                continue
+            return {self.input_name: to_blob(self.pre(img).image)}
+        return None
+
+    def rewind(self):
+        self.it = iter(self.paths)
+
+
+def head_nodes(model):
+    """检测头（最后一个 /model.N/ 模块）的节点名称。
+
+    框回归 (DFL) 和类别分数对量化误差最敏感，默认保留为 FP32。
+    """
+    pat = re.compile(r"^/model\.(\d+)/")
+    idx = [int(m.group(1)) for n in model.graph.node if (m := pat.match(n.name))]
+    if not idx:
+        return []
+    prefix = f"/model.{max(idx)}/"
+    return [n.name for n in model.graph.node if n.name.startswith(prefix)]
+
+
+def quantize(fp32_path, int8_path, calib_paths, model_cfg, per_channel=False, quantize_head=False):
+    import onnx
+    import onnxruntime as ort
+    from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+
+    session = ort.InferenceSession(fp32_path, providers=["CPUExecutionProvider"])
+    inp = session.get_inputs()[0]
+    h, w = inp.shape[2:4]
+    # 与 YoloDetector 相同的预处理，校准和评估的输入分布要与实际推理一致
+    reader = ImageCalibrationReader(calib_paths, inp.name, load_preprocessor(model_cfg, letterbox=True, shape=(h, w)))
+
+    model = onnx.load(fp32_path)
+    exclude = [] if quantize_head else head_nodes(model)
+    print(f"校准图片 {len(calib_paths)} 张, 不量化检测头节点 {len(exclude)} 个")
+    quantize_static(
+        fp32_path, int8_path, reader,
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=per_channel,
+        calibrate_method=CalibrationMethod.MinMax,
+        nodes_to_exclude=exclude,
+    )
+
+    # 保留 ultralytics 写入的元数据（类别名称等），YoloDetector 依赖它读取类别
+    q = onnx.load(int8_path)
+    if not q.metadata_props and model.metadata_props:
+        q.metadata_props.extend(model.metadata_props)
+        onnx.save(q, int8_path)
+
+
+def val_split(data_yaml="data/yolo/data.yaml"):
+    """验证集 (图片路径, 标注路径) 列表；验证集为空时退回训练集"""
+    data = yaml.safe_load(open(data_yaml, encoding="utf-8"))
+    root = os.path.dirname(data_yaml)  # data.yaml 中的 path 是作者机器上的绝对路径，不使用
+    label_names = data["names"]
+    for split in ("val", "train"):
+        images = sorted(glob.glob(os.path.join(root, data[split], "*.jpg")))
+        pairs = []
+        for p in images:
+            stem = os.path.splitext(os.path.basename(p))[0]
+            label = os.path.join(root, "labels", split, stem + ".txt")
+            if os.path.exists(label):
+                pairs.append((p, label))
+        if pairs:
+            if split != "val":
+                print(f"警告: 验证集没有带标注的图片，改用 {split} 集评估")
+            return split, pairs, label_names
+    return None, [], label_names
+
+
+def split_eval_calib(calib_paths, holdout=4):
+    """评估集与校准集分开：评估图片不参与校准。
+
+    有验证集时整个验证集用于评估；退回训练集时每 holdout 张留出一张评估，其余用于校准。
+    返回 (评估集名称, 评估 (图片, 标注) 列表, 类别名, 校准图片列表)。
+    """
+    split, pairs, label_names = val_split()
+    if split == "train":
+        pairs = pairs[::max(2, holdout)]
+        split = f"train (每 {max(2, holdout)} 张留出 1 张，不参与校准)"
+    key = lambda p: os.path.normcase(os.path.abspath(p))
+    held = {key(p) for p, _ in pairs}
+    return split, pairs, label_names, [p for p in calib_paths if key(p) not in held]
+
+
+def load_labels(label_path, shape, label_names, normalize):
+    """YOLO 标注 -> [(标准化名称, xyxy)]"""
+    h, w = shape[:2]
+    boxes = []
+    for line in open(label_path, encoding="utf-8"):
+        parts = line.split()
+        if len(parts) != 5:
+            continue
+        cls_id, cx, cy, bw, bh = int(parts[0]), *map(float, parts[1:])
+        name = normalize(label_names.get(cls_id, str(cls_id)))
+        boxes.append((name, [(cx - bw / 2) * w, (cy - bh / 2) * h, (cx + bw / 2) * w, (cy + bh / 2) * h]))
+    return boxes
+
+
+def box_iou(a, b):
+    """(N, 4) x (M, 4) -> (N, M)"""
+    a, b = np.asarray(a, np.float32).reshape(-1, 4), np.asarray(b, np.float32).reshape(-1, 4)
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = (rb - lt).clip(0).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).clip(0).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).clip(0).prod(axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def match(preds, gts, iou_thres=0.5):
+    """同名框按置信度贪心匹配。preds: [(名称, xyxy, conf)]，gts: [(名称, xyxy)]
+
+    返回 [(名称, conf, 是否命中)] 和每个名称的真值框数。
+    """
+    out = []
+    n_gt = {}
+    for name, _ in gts:
+        n_gt[name] = n_gt.get(name, 0) + 1
+    for name in {p[0] for p in preds} | set(n_gt):
+        p = sorted((x for x in preds if x[0] == name), key=lambda x: -x[2])
+        g = [x[1] for x in gts if x[0] == name]
+        used = np.zeros(len(g), dtype=bool)
+        iou = box_iou([x[1] for x in p], g) if p and g else np.zeros((len(p), 0))
+        for i, (_, _, conf) in enumerate(p):
+            j = int(np.argmax(np.where(used, -1, iou[i]))) if g else -1
+            hit = bool(j >= 0 and not used[j] and iou[i, j] >= iou_thres)
+            if hit:
+                used[j] = True
+            out.append((name, conf, hit))
+    return out, n_gt
+
+
+def average_precision(records, n_gt):
+    """[(conf, 是否命中)] -> AP（全点插值）、精确率、召回率"""
+    if n_gt == 0:
+        return None, None, None
+    if not records:
+        return 0.0, 0.0, 0.0
+    records = sorted(records, key=lambda x: -x[0])
+    tp = np.cumsum([hit for _, hit in records])
+    fp = np.cumsum([not hit for _, hit in records])
+    recall = tp / n_gt
+    precision = tp / (tp + fp)
+    mrec = np.concatenate([[0.0], recall, [1.0]])
+    mpre = np.concatenate([[1.0], precision, [0.0]])
+    mpre = np.maximum.accumulate(mpre[::-1])[::-1]
+    i = np.flatnonzero(mrec[1:] != mrec[:-1])
+    ap = float(np.sum((mrec[i + 1] - mrec[i]) * mpre[i + 1]))
+    return ap, float(precision[-1]), float(recall[-1])
+
+
+def evaluate(backend, pre, pairs, label_names, normalize):
+    """返回 (指标, 每张图的预测列表)"""
+    records, n_gt, all_preds = {}, {}, []
+    for image_path, label_path in pairs:
+        img = imread(image_path)
+        dets = backend.infer_prepared(pre(img))
+        preds = [(normalize(d["name"]), d["xyxy"], d["conf"]) for d in dets]
+        all_preds.append(preds)
+        matched, counts = match(preds, load_labels(label_path, img.shape, label_names, normalize))
+        for name, conf, hit in matched:
+            records.setdefault(name, []).append((conf, hit))
+        for name, n in counts.items():
+            n_gt[name] = n_gt.get(name, 0) + n
+    per_class = {}
+    for name, n in n_gt.items():
+        ap, p, r = average_precision(records.get(name, []), n)
+        per_class[name] = {"ap50": ap, "precision": p, "recall": r, "labels": n}
+    aps = [v["ap50"] for v in per_class.values()]
+    return {"map50": float(np.mean(aps)) if aps else None, "classes": per_class}, all_preds
+
+
+def agreement(ref_preds, preds):
+    """以 FP32 结果为参照，INT8 结果的召回率（IoU≥0.5 且名称相同）"""
+    hits = total = 0
+    for ref, pred in zip(ref_preds, preds):
+        matched, _ = match([(n, b, c) for n, b, c in pred], [(n, b) for n, b, _ in ref])
+        hits += sum(hit for _, _, hit in matched)
+        total += len(ref)
+    return hits / total if total else None
+
+
+def latency(backend, pre, frames, runs=50, warmup=5):
+    backend.metrics = Metrics()
+    for i in range(warmup):
+        backend.infer_prepared(pre(frames[i % len(frames)]))
+    backend.metrics.histograms.clear()
+    for i in range(runs):
+        with backend.metrics.timer("total"):
+            backend.infer_prepared(pre(frames[i % len(frames)]))
+    return backend.metrics.to_dict()["stages"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ONNX 检测模型 INT8 静态量化")
+    parser.add_argument("model", help="导出的 FP32 ONNX 模型")
+    parser.add_argument("--out", default=None, help="INT8 模型路径，默认 <model>.int8.onnx")
+    parser.add_argument("--config", default="config/config.yaml", help="读取 model.preprocess 增强参数")
+    parser.add_argument("--report", default=os.path.join("runs", "quant", "report.json"))
+    parser.add_argument("--names-file", default=None, help="模型元数据中没有类别名称时使用")
+    parser.add_argument("--per-channel", action="store_true", help="卷积权重按通道量化")
+    parser.add_argument("--quantize-head", action="store_true", help="检测头也量化（更快，精度损失更大）")
+    parser.add_argument("--runs", type=int, default=50, help="延迟测量的推理次数")
+    parser.add_argument("--threads", type=int, default=0, help="intra_op 线程数，0 由 onnxruntime 决定")
+    parser.add_argument("--eval-holdout", type=int, default=4,
+                        help="没有验证集时从训练集中每 N 张留出一张评估（不参与校准）")
+    parser.add_argument("--conf", type=float, default=0.4)
+    parser.add_argument("--iou", type=float, default=0.5)
+    args = parser.parse_args()
+
+    out = args.out or os.path.splitext(args.model)[0] + ".int8.onnx"
+    calib_paths = sorted(p for g in CALIB_GLOBS for p in glob.glob(g))
+    # 评估图片从校准集中排除，否则 INT8 与 FP32 的精度差会被低估
+    split, pairs, label_names, calib_paths = split_eval_calib(calib_paths, args.eval_holdout)
+    if not calib_paths:
+        raise FileNotFoundError(f"找不到校准图片: {CALIB_GLOBS}")
+
+    model_cfg = yaml.safe_load(open(args.config, encoding="utf-8"))["model"]
+    t0 = time.perf_counter()
+    quantize(args.model, out, calib_paths, model_cfg, per_channel=args.per_channel, quantize_head=args.quantize_head)
+    print(f"INT8 模型已保存到: {out} ({time.perf_counter() - t0:.1f}s)")
+
+    normalize = SlidingCounter().normalize_detection_name
+    frames = [imread(p) for p in calib_paths[:10]]
+    report = {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "platform": platform.platform(),
+        "processor": platform.processor(),
+        "fp32_model": args.model,
+        "int8_model": out,
+        "per_channel": args.per_channel,
+        "quantize_head": args.quantize_head,
+        "calibration_images": len(calib_paths),
+        "eval_split": split,
+        "eval_images": len(pairs),
+    }
+    preds = {}
+    for key, path in (("fp32", args.model), ("int8", out)):
+        backend = OnnxBackend(path, conf=args.conf, iou=args.iou, intra_op_threads=args.threads,
+                              names_file=args.names_file)
+        pre = load_preprocessor(model_cfg, letterbox=True, shape=backend.shape)
+        accuracy, preds[key] = evaluate(backend, pre, pairs, label_names, normalize)
+        report[key] = {
+            "size_mb": os.path.getsize(path) / 1024 / 1024,
+            "accuracy": accuracy,
+            "latency": latency(backend, pre, frames, runs=args.runs),
+        }
+    report["int8_agreement_with_fp32"] = agreement(preds["fp32"], preds["int8"])
+
+    for key in ("fp32", "int8"):
+        r = report[key]
+        lat = r["latency"]["total"]
+        map50 = r["accuracy"]["map50"]
+        print(f"{key}: {r['size_mb']:.1f} MB, mAP50={map50 if map50 is None else round(map50, 3)}, "
+              f"延迟 p50={lat['p50_ms']:.1f}ms p95={lat['p95_ms']:.1f}ms")
+    if report["int8_agreement_with_fp32"] is not None:
+        print(f"INT8 与 FP32 检测结果一致率: {report['int8_agreement_with_fp32']:.3f}")
+
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"报告已保存到: {args.report}")
+
+
+if __name__ == "__main__":
+    main()
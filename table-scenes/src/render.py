@@ -0,0 +1,108 @@
+# 渲染 - 与检测解耦，按限定帧率绘制最新一份结果快照
+import threading
+import time
+
+import cv2
+from metrics import Metrics
+from roi import draw_roi
+from viz import overlay_scene, overlay_counts, draw_detections
+
+
+class Renderer:
+    """绘制检测结果并显示。
+
+    mode:
+      inline   - 由调用方线程绘制（主线程），超过 max_fps 的帧直接跳过
+      threaded - 独立线程只绘制最新快照，显示开销不会拖慢检测
+                 （macOS 上 GUI 只能在主线程调用，请使用 inline）
+    """
+
+    def __init__(self, roi_cfg, max_items=8, max_fps=15, mode="inline", window="table-scenes-s1", metrics=None):
+        self.roi_cfg = roi_cfg
+        self.metrics = metrics if metrics is not None else Metrics(enabled=False)
+        self.max_items = max_items
+        self.interval = 1.0 / max_fps if max_fps else 0.0
+        self.mode = mode
+        self.window = window
+        self.cond = threading.Condition()
+        self.snapshot = None
+        self.last_draw = 0.0
+        self.drawn = 0
+        self.quit_requested = False
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        if self.mode == "threaded" and not self.running:
+            self.running = True
+            self.thread = threading.Thread(target=self._worker, name="renderer", daemon=True)
+            self.thread.start()
+        return self
+
+    def submit(self, frame, dets, scene, counts):
+        """提交一份结果快照；inline 模式下立即（按帧率限制）绘制"""
+        snapshot = (frame, dets, scene, counts)
+        if self.mode == "threaded":
+            with self.cond:
+                self.snapshot = snapshot  # 只保留最新一份，旧快照直接丢弃
+                self.cond.notify()
+        elif time.monotonic() - self.last_draw >= self.interval:
+            self._draw(snapshot)
+        elif self.drawn:
+            # 限速跳过的帧也要处理窗口事件，否则两次绘制之间 q/ESC 无响应
+            self._poll_keys()
+
+    def _worker(self):
+        while self.running and not self.quit_requested:
+            with self.cond:
+                while self.snapshot is None and self.running:
+                    self.cond.wait(0.1)
+                snapshot, self.snapshot = self.snapshot, None
+            if snapshot is None:
+                continue
+            self._draw(snapshot)
+            # 限制显示帧率
+            delay = self.last_draw + self.interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    def _draw(self, snapshot):
+        with self.metrics.timer("render"):
+            self._draw_snapshot(snapshot)
+
+    def _draw_snapshot(self, snapshot):
+        frame, dets, scene, counts = snapshot
+        self.last_draw = time.monotonic()
+        # 在画面中框出检测到的物体
+        draw_detections(frame, dets)
+        overlay_scene(frame, scene)
+        overlay_counts(frame, counts, max_items=self.max_items)
+        draw_roi(frame, self.roi_cfg)
+        cv2.imshow(self.window, frame)
+        self._poll_keys()
+        self.drawn += 1
+
+    def _poll_keys(self):
+        key = cv2.waitKey(1) & 0xFF
+        if key == 27 or key == ord('q'):
+            print("用户按下了q或ESC，程序退出")
+            self.quit_requested = True
+
+    def stop(self):
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+            self.thread = None
+        cv2.destroyAllWindows()
+
+
+def load_renderer(cfg_viz, cfg_roi, metrics=None, window="table-scenes-s1"):
+    """按配置创建渲染器；headless（或 viz.enabled 为 false）时返回 None，不做任何绘制"""
+    cfg_viz = cfg_viz or {}
+    mode = cfg_viz.get("mode", "inline")
+    if not cfg_viz.get("enabled", True) or mode == "headless":
+        return None
+    return Renderer(cfg_roi, max_items=cfg_viz.get("max_items", 8),
+                    max_fps=cfg_viz.get("max_fps", 15), mode=mode, window=window, metrics=metrics).start()
@@ -2,19 +2,68 @@
 import cv2, numpy as np
 
 
+class Roi:
+    """ROI 多边形。
+
+    roi(xyxy) 判断单个框的中心是否在多边形内（兼容旧接口）；
+    roi.filter(dets) 对整批检测结果做向量化过滤。
+    """
+
+    def __init__(self, polygon):
+        self.poly = np.array(polygon, dtype=np.int32)
+        self.x0, self.y0 = self.poly.min(axis=0)
+        self.x1, self.y1 = self.poly.max(axis=0)
+        # 多边形各条边的起点 (ax, ay) 和终点 (bx, by)，整数运算，判断结果与 pointPolygonTest 一致
+        a = self.poly.astype(np.int64)
+        b = np.roll(a, -1, axis=0)
+        self.ax, self.ay, self.bx, self.by = a[:, 0], a[:, 1], b[:, 0], b[:, 1]
+
+    def __call__(self, xyxy):
+        x1, y1, x2, y2 = map(int, xyxy)
+        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
+        return cv2.pointPolygonTest(self.poly, (cx, cy), False) >= 0
+
+    def contains(self, xyxy):
+        """(N, 4) 框数组 -> (N,) 布尔数组，框中心在多边形内（含边上）为 True，与 roi(xyxy) 逐框结果相同"""
+        xyxy = np.asarray(xyxy).reshape(-1, 4).astype(np.int64)
+        px = ((xyxy[:, 0] + xyxy[:, 2]) // 2)[:, None]
+        py = ((xyxy[:, 1] + xyxy[:, 3]) // 2)[:, None]
+        ax, ay, bx, by = self.ax, self.ay, self.bx, self.by
+        # 叉积 > 0：点在边 a->b 的左侧；为 0 且在边的外接矩形内即在边上
+        cross = (bx - ax) * (py - ay) - (by - ay) * (px - ax)
+        on_edge = (cross == 0) & (px >= np.minimum(ax, bx)) & (px <= np.maximum(ax, bx)) \
+            & (py >= np.minimum(ay, by)) & (py <= np.maximum(ay, by))
+        # 射线法：向右的水平射线与边相交的次数为奇数时在多边形内
+        crosses = ((ay > py) != (by > py)) & np.where(by > ay, cross > 0, cross < 0)
+        return (crosses.sum(axis=1) % 2 == 1) | on_edge.any(axis=1)
+
+    def crop_rect(self, pad=32):
+        """多边形外接矩形向外扩 pad 像素 -> (x0, y0, x1, y1)，超出画面的部分由使用方裁掉"""
+        return (max(0, int(self.x0) - pad), max(0, int(self.y0) - pad),
+                int(self.x1) + 1 + pad, int(self.y1) + 1 + pad)
+
+    def filter(self, dets):
+        """过滤检测结果；支持 Detections 和旧的 dict 列表"""
+        if hasattr(dets, "xyxy"):
+            return dets[self.contains(dets.xyxy)] if len(dets) else dets
+        return [d for d in dets if self(d["xyxy"])]
+
+
 def load_roi(cfg_roi):
     if not cfg_roi.get('enabled', False):
         return None
-    poly = np.array(cfg_roi['polygon'], dtype=np.int32)
-    def inside(xyxy):
-        x1, y1, x2, y2 = map(int, xyxy)
-        cx, cy = (x1 + x2) // 2, (y1 + y2) // 2
-        return cv2.pointPolygonTest(poly, (cx, cy), False) >= 0
-    return inside
+    return Roi(cfg_roi['polygon'])
+
+
+def load_crop(cfg_roi):
+    """roi.crop_inference 开启时返回推理裁剪区域，否则返回 None"""
+    if not cfg_roi.get('enabled', False) or not cfg_roi.get('crop_inference', False):
+        return None
+    return Roi(cfg_roi['polygon']).crop_rect(cfg_roi.get('crop_pad', 32))
 
 
 def draw_roi(frame, cfg_roi):
     if not cfg_roi.get('enabled', False):
         return
     poly = np.array(cfg_roi['polygon'], dtype=np.int32)
-    cv2.polylines(frame, [poly], isClosed=True, color=(0,255,255), thickness=2)
\ No newline at end of file
+    cv2.polylines(frame, [poly], isClosed=True, color=(0,255,255), thickness=2)
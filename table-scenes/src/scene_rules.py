@@ -1,79 +1,348 @@
 # 场景判定规则 - 基于当前帧的检测结果计算场景分数
+# 规则在启动时编译为 (物品 x 特征) 权重矩阵和覆盖条件，每帧只做一次矩阵-向量乘法
+# 规则集可以写在 config/scene_rules.yaml 中，RuleWatcher 检测到文件修改后在线替换
+import os
+import time
+
+import numpy as np
+import yaml
+
+# 扑克牌相关的所有可能文本描述
+POKER_TERMS = [
+	"poker", "playing cards", "deck of cards", "poker cards",
+	"playing card deck", "card game", "card deck", "cards for gambling",
+	"casino cards", "rectangular paper cards with numbers and suits",
+	"hearts spades clubs diamonds cards", "face cards",
+	"poker game cards", "bridge cards", "standard 52-card deck",
+	"playing card set", "gaming cards"
+]
+
+# 筷子相关的所有可能文本描述
+CHOPSTICKS_TERMS = [
+	"chopsticks", "wooden chopsticks", "bamboo chopsticks",
+	"wooden eating utensils", "long thin wooden sticks for eating",
+	"asian eating utensils", "chinese chopsticks",
+	"japanese chopsticks", "korean chopsticks",
+	"black chopsticks", "pair of thin wooden sticks",
+	"traditional asian eating tools", "wooden rods used for eating",
+	"slender wooden eating implements",
+	"straight thin wooden sticks used in asian cuisine"
+]
+
+# 规则集格式：
+#   groups:    物品名称列表
+#   features:  特征 = 若干 {group, weight, present} 项之和；present 为 true 时统计出现的不同物品数，否则统计检测数
+#   scenes:    参与比较的场景特征（顺序即同分时的优先级）
+#   overrides: 按顺序检查的覆盖条件，满足即返回 scene：
+#              require 特征 > 0，且 value 特征 >= min，且 value 特征 >= ratio * 最高场景分
+#   fallback:  argmax（取最高分场景，全为 0 时返回 default）或 none（直接返回 default）
+#   default:   没有任何场景成立时的场景（空场景），切换到该场景需要经过迟滞确认
+#   switching: 场景切换逻辑使用的关键物品信号（特征分数 > 0 即视为出现，见 scene_state.SceneStateMachine）
+#              force: 按顺序检查的 {signal, scene, reason}，信号出现（且本帧判断为 scene，如指定）时立即切换
+#              keep:  {场景: 信号}，维持该场景所需的信号；信号消失但仍有其他物品时尽快重置窗口
+# has_ 开头的特征不参与评分，只作为切换信号
+DEFAULT_RULES = {
+	"groups": {
+		"work_items": ['laptop', 'book', 'mouse', 'keyboard'],
+		"dining_items": ['bowl', 'cup', 'wine glass', 'spoon', 'fork', 'knife', 'dining table'],
+		"entertainment_items": ['remote', 'cell phone', 'chess board', 'board game pieces'],
+		"poker": POKER_TERMS,
+		"chopsticks": CHOPSTICKS_TERMS,
+		"person": ['person'],
+		# 场景切换时判断的关键物品
+		"poker_signal": ["poker", "playing cards", "deck of cards", "poker cards", "card game", "card deck",
+			"gaming cards"],
+		"chopsticks_signal": ["chopsticks", "wooden chopsticks", "bamboo chopsticks"],
+	},
+	"features": {
+		"work": [{"group": "work_items", "weight": 10}],  # 给予工作场景项目较高权重
+		"dining": [{"group": "dining_items", "weight": 5}, {"group": "chopsticks", "weight": 10}],  # 筷子是强烈的餐饮场景指示
+		"entertaining": [{"group": "entertainment_items", "weight": 5}, {"group": "poker", "weight": 15}],  # 扑克牌是强烈的娱乐场景指示
+		"relax": [{"group": "person", "weight": 3}],  # 人的存在是休闲场景的基础
+		"poker_score": [{"group": "poker", "weight": 15}],
+		"chopsticks_score": [{"group": "chopsticks", "weight": 10}],
+		"work_count": [{"group": "work_items"}],
+		"has_poker": [{"group": "poker_signal", "present": True}],
+		"has_chopsticks": [{"group": "chopsticks_signal", "present": True}],
+		"has_work_items": [{"group": "work_items", "present": True}],
+		"has_dining_items": [{"group": "dining_items", "present": True}],
+	},
+	"scenes": ["work", "dining", "entertaining", "relax"],
+	"overrides": [
+		# 扑克牌是娱乐场景的明确标志
+		{"scene": "entertaining", "require": "poker_score", "value": "poker_score", "ratio": 0.8},
+		# 筷子配合其他餐具是用餐场景的明确标志
+		{"scene": "dining", "require": "chopsticks_score", "value": "dining", "ratio": 0.8},
+		{"scene": "work", "value": "work_count", "min": 1},
+	],
+	"fallback": "argmax",
+	"default": "nothing",
+	"switching": {
+		# 特征物品优先级：扑克牌 > 工作物品 > 餐饮物品
+		"force": [
+			{"signal": "has_poker", "reason": "扑克牌"},
+			{"signal": "has_work_items", "scene": "work", "reason": "工作物品"},
+			{"signal": "has_dining_items", "scene": "dining", "reason": "餐饮物品"},
+		],
+		"keep": {"work": "has_work_items", "dining": "has_dining_items", "entertaining": "has_poker"},
+	},
+}
+
+# utils.decide_scene 的优先级规则: WORK > DINING > ENTERTAINING > RELAX > NOLIGHT
+PRIORITY_RULES = {
+	"groups": {
+		"work": ["laptop", "mouse", "keyboard", "book", "newspaper"],
+		"dining": ["chopsticks", "bowl", "plate", "spoon", "fork"],
+		"entertain": ["painter", "paint", "chess"],
+		"relax": ["cup", "person"],
+	},
+	"features": {
+		"WORK": [{"group": "work", "present": True}],
+		"DINING": [{"group": "dining", "present": True}],
+		"ENTERTAINING": [{"group": "entertain", "present": True}],
+		"RELAX": [{"group": "relax", "present": True}],
+	},
+	"scenes": ["WORK", "DINING", "ENTERTAINING", "RELAX"],
+	"overrides": [
+		{"scene": "WORK", "value": "WORK", "min": 1},
+		{"scene": "DINING", "value": "DINING", "min": 2},
+		{"scene": "ENTERTAINING", "value": "ENTERTAINING", "min": 1},
+		{"scene": "RELAX", "value": "RELAX", "min": 1},
+	],
+	"fallback": "none",
+	"default": "NOLIGHT",
+	"switching": {
+		"force": [],
+		"keep": {"WORK": "WORK", "DINING": "DINING", "ENTERTAINING": "ENTERTAINING"},
+	},
+}
+
+
+class SceneScorer:
+	"""编译后的场景规则。
+
+	vocab 为规则中出现的所有物品名称；计数向量 x (len(vocab),) 与出现向量 (x > 0)
+	拼接后乘以权重矩阵 (2*len(vocab), 特征数) 得到全部特征分数，再依次检查覆盖条件。
+	"""
+
+	def __init__(self, spec):
+		_validate(spec)
+		groups = spec.get("groups", {})
+		self.vocab = list(dict.fromkeys(n for g in groups.values() for n in g))
+		self.index = {n: i for i, n in enumerate(self.vocab)}
+		# 场景特征排在前面，最高场景分只需对前几列取最大值
+		self.scenes = list(spec["scenes"])
+		self.features = self.scenes + [f for f in spec["features"] if f not in self.scenes]
+		self.feature_index = fidx = {f: j for j, f in enumerate(self.features)}
+		v = len(self.vocab)
+		self.matrix = np.zeros((2 * v, len(self.features)), dtype=np.float64)
+		for f, terms in spec["features"].items():
+			for term in terms:
+				offset = v if term.get("present", False) else 0
+				for name in groups[term["group"]]:
+					self.matrix[offset + self.index[name], fidx[f]] += term.get("weight", 1)
+		self.n_scenes = len(self.scenes)
+		self.overrides = [
+			(o["scene"], fidx[o["require"]] if o.get("require") else -1, fidx[o["value"]], o.get("min"), o.get("ratio"))
+			for o in spec.get("overrides", [])
+		]
+		self.argmax = spec.get("fallback", "argmax") == "argmax"
+		self.default = spec.get("default", "nothing")
+		switching = spec.get("switching") or {}
+		# (信号特征列, 限定场景或 None, 原因)；{场景: 信号特征列}
+		self.force = [(fidx[t["signal"]], t.get("scene"), t.get("reason", t["signal"]))
+			for t in switching.get("force", [])]
+		self.keep = {s: fidx[sig] for s, sig in switching.get("keep", {}).items()}
+
+	def vector(self, counts):
+		"""{名称: 计数} -> [计数向量, 出现向量] 拼接 (2*len(vocab),)"""
+		v = len(self.vocab)
+		z = [0.0] * (2 * v)
+		index = self.index
+		for name, n in counts.items():
+			i = index.get(name)
+			if i is not None and n:
+				z[i] += n
+				z[v + i] = 1.0
+		return z
+
+	def feature_scores(self, z):
+		"""拼接后的计数/出现向量 -> 全部特征分数（一次矩阵-向量乘法）"""
+		return np.dot(z, self.matrix)
+
+	def decide_scores(self, f):
+		"""特征分数 -> 场景"""
+		f = f.tolist()  # 特征数很少，逐个比较用 Python 浮点数更快
+		top = None
+		for scene, require, value, min_v, ratio in self.overrides:
+			if require >= 0 and f[require] <= 0:
+				continue
+			if min_v is not None and f[value] < min_v:
+				continue
+			if ratio is not None:
+				if top is None:
+					top = max(f[:self.n_scenes])
+				if f[value] < ratio * top:
+					continue
+			return scene
+		if self.argmax:
+			s = f[:self.n_scenes]
+			top = max(s)
+			if top > 0:
+				return self.scenes[s.index(top)]  # 同分时取靠前的场景
+		return self.default
+
+	def decide(self, counts):
+		return self.decide_scores(self.feature_scores(self.vector(counts)))
+
+	def evaluate(self, counts):
+		"""-> (场景, {特征: 分数})，同时需要场景和关键物品信号时只算一次"""
+		f = self.feature_scores(self.vector(counts))
+		return self.decide_scores(f), dict(zip(self.features, f.tolist()))
+
+	def scores(self, counts):
+		"""调试用：{特征: 分数}"""
+		return dict(zip(self.features, self.feature_scores(self.vector(counts)).tolist()))
+
+	def bind(self, names):
+		"""按类别名称顺序绑定，返回 BoundSceneScorer，可直接对类别 id 计数向量打分"""
+		return BoundSceneScorer(self, names)
+
+
+class BoundSceneScorer:
+	"""绑定到类别 id 顺序（如 Detections.names 或 MultiHorizonCounter.names）的评分器"""
+
+	def __init__(self, scorer, names):
+		self.scorer = scorer
+		v = len(scorer.vocab)
+		rows = np.array([scorer.index.get(n, -1) for n in names], dtype=np.int64)
+		known = rows >= 0
+		# 类别 id x 特征 权重矩阵；规则中没有的类别对应全 0 行
+		self.count_matrix = np.zeros((len(names), len(scorer.features)))
+		self.present_matrix = np.zeros((len(names), len(scorer.features)))
+		self.count_matrix[known] = scorer.matrix[rows[known]]
+		self.present_matrix[known] = scorer.matrix[v + rows[known]]
+
+	def feature_scores(self, vec):
+		"""vec: 类别 id 计数向量，长度不超过绑定的类别数"""
+		vec = np.asarray(vec, dtype=np.float64)
+		n = len(vec)
+		return vec @ self.count_matrix[:n] + (vec > 0) @ self.present_matrix[:n]
+
+	def decide(self, vec):
+		return self.scorer.decide_scores(self.feature_scores(vec))
+
+
+def _validate(spec):
+	"""规则集引用的分组/特征必须存在，错误以 ValueError 报告（热加载时保留旧规则）"""
+	if not isinstance(spec, dict):
+		raise ValueError("规则集必须是字典")
+	groups, features = spec.get("groups", {}), spec.get("features", {})
+	for f, terms in features.items():
+		for term in terms:
+			if term.get("group") not in groups:
+				raise ValueError(f"特征 {f} 引用了不存在的分组: {term.get('group')}")
+	for s in spec.get("scenes", []):
+		if s not in features:
+			raise ValueError(f"场景 {s} 没有对应的特征")
+	for o in spec.get("overrides", []):
+		for key in ("require", "value"):
+			if o.get(key) and o[key] not in features:
+				raise ValueError(f"覆盖条件引用了不存在的特征: {o[key]}")
+	if spec.get("fallback", "argmax") not in ("argmax", "none"):
+		raise ValueError(f"未知的 fallback: {spec['fallback']}")
+	# 切换逻辑不再有内置的场景名称，规则集必须写明自己的切换信号
+	switching = spec.get("switching")
+	if not isinstance(switching, dict) or "force" not in switching or "keep" not in switching:
+		raise ValueError("规则集缺少 switching.force / switching.keep")
+	scene_names = {o["scene"] for o in spec.get("overrides", [])} | set(spec.get("scenes", []))
+	for t in switching["force"]:
+		if t.get("signal") not in features:
+			raise ValueError(f"switching.force 引用了不存在的特征: {t.get('signal')}")
+		if t.get("scene") is not None and t["scene"] not in scene_names:
+			raise ValueError(f"switching.force 引用了不存在的场景: {t['scene']}")
+	for s, sig in switching["keep"].items():
+		if s not in scene_names:
+			raise ValueError(f"switching.keep 引用了不存在的场景: {s}")
+		if sig not in features:
+			raise ValueError(f"switching.keep 引用了不存在的特征: {sig}")
+
+
+def compile_rules(spec):
+	return SceneScorer(spec)
+
+
+def load_rule_set(path, name=None):
+	"""读取规则文件中的一个规则集并编译；name 为空时取文件中 active 指定的规则集"""
+	with open(path, encoding="utf-8") as f:
+		doc = yaml.safe_load(f) or {}
+	sets = doc.get("rule_sets", {})
+	name = name or doc.get("active", "default")
+	if name not in sets:
+		raise ValueError(f"{path} 中没有规则集 {name}")
+	return compile_rules(sets[name])
+
+
+class RuleWatcher:
+	"""持有当前场景评分器，定期检查规则文件的修改时间，修改后重新编译并替换。
+
+	check() 在聚合阶段每帧调用，未到 poll_s 间隔时只读一次时钟；
+	新规则编译失败时打印错误并继续使用旧规则。path 为 None 时固定使用 DEFAULT_RULES。
+	"""
+
+	def __init__(self, path=None, name=None, watch=True, poll_s=1.0, clock=time.monotonic):
+		self.path = path
+		self.name = name
+		self.watch = watch and path is not None
+		self.poll_s = poll_s
+		self.clock = clock
+		self._mtime = None
+		self._next_poll = 0.0
+		if path is None:
+			self.scorer = _DEFAULT_SCORER
+		else:
+			self._mtime = os.stat(path).st_mtime_ns
+			self.scorer = load_rule_set(path, name)
+
+	def check(self):
+		"""规则已替换时返回 True"""
+		if not self.watch:
+			return False
+		now = self.clock()
+		if now < self._next_poll:
+			return False
+		self._next_poll = now + self.poll_s
+		try:
+			mtime = os.stat(self.path).st_mtime_ns
+		except OSError:
+			return False  # 编辑器保存时文件可能短暂不存在
+		if mtime == self._mtime:
+			return False
+		self._mtime = mtime
+		try:
+			scorer = load_rule_set(self.path, self.name)
+		except (OSError, yaml.YAMLError, ValueError, KeyError, TypeError, AttributeError) as e:
+			print(f"场景规则加载失败，继续使用旧规则: {e}")
+			return False
+		self.scorer = scorer
+		print(f"场景规则已重新加载: {self.path}")
+		return True
+
+
+_DEFAULT_SCORER = compile_rules(DEFAULT_RULES)
+
+
+def load_scene_rules(cfg_rules):
+	"""按 scene_rules 配置返回 RuleWatcher；未配置或文件不存在时使用内置 DEFAULT_RULES"""
+	cfg_rules = cfg_rules or {}
+	path = cfg_rules.get("path")
+	if path and not os.path.exists(path):
+		print(f"场景规则文件不存在，使用内置规则: {path}")
+		path = None
+	return RuleWatcher(path, name=cfg_rules.get("set"), watch=cfg_rules.get("watch", True),
+		poll_s=cfg_rules.get("poll_s", 1.0))
+
+
 def decide_scene(c):
-	# 扑克牌相关的所有可能文本描述
-	poker_terms = [
-		"poker", "playing cards", "deck of cards", "poker cards", 
-		"playing card deck", "card game", "card deck", "cards for gambling",
-		"casino cards", "rectangular paper cards with numbers and suits",
-		"hearts spades clubs diamonds cards", "face cards",
-		"poker game cards", "bridge cards", "standard 52-card deck",
-		"playing card set", "gaming cards"
-	]
-	
-	# 筷子相关的所有可能文本描述
-	chopsticks_terms = [
-		"chopsticks", "wooden chopsticks", "bamboo chopsticks", 
-		"wooden eating utensils", "long thin wooden sticks for eating", 
-		"asian eating utensils", "chinese chopsticks",
-		"japanese chopsticks", "korean chopsticks",
-		"black chopsticks", "pair of thin wooden sticks",
-		"traditional asian eating tools", "wooden rods used for eating",
-		"slender wooden eating implements", 
-		"straight thin wooden sticks used in asian cuisine"
-	]
-	
-	# 辅助函数，计算多个关键词的检测总数
-	g = lambda *ks: sum(c.get(k, 0) for k in ks)
-	
-	# 辅助函数，检查是否存在至少一个与给定术语列表匹配的检测
-	def check_terms(terms_list):
-		return sum(c.get(term, 0) for term in terms_list)
-	
-	# 计算每个场景的分数
-	scores = {}
-	
-	# WORK - 工作场景
-	work_items = ['laptop', 'book', 'mouse', 'keyboard']
-	scores['work'] = g(*work_items) * 10  # 给予工作场景项目较高权重
-	
-	# DINING - 用餐场景
-	dining_items = ['bowl', 'cup', 'wine glass', 'spoon', 'fork', 'knife', 'dining table']
-	scores['dining'] = g(*dining_items) * 5  # 基础餐具分数
-	
-	# 为筷子增加额外分数
-	chopsticks_score = check_terms(chopsticks_terms) * 10  # 筷子是强烈的餐饮场景指示
-	scores['dining'] += chopsticks_score
-	
-	# ENTERTAINING - 娱乐场景
-	entertainment_items = ['remote', 'cell phone', 'chess board', 'board game pieces']
-	scores['entertaining'] = g(*entertainment_items) * 5  # 基础娱乐项目分数
-	
-	# 为扑克牌增加额外分数
-	poker_score = check_terms(poker_terms) * 15  # 扑克牌是强烈的娱乐场景指示
-	scores['entertaining'] += poker_score
-	
-	# RELAX - 休闲场景
-	scores['relax'] = c.get('person', 0) * 3  # 人的存在是休闲场景的基础
-	
-	# NOTHING - 兜底场景
-	scores['nothing'] = 1 if sum(scores.values()) == 0 else 0
-	
-	# 检查是否有任何显著特征明确指向特定场景
-	if poker_score > 0 and poker_score >= max(scores.values()) * 0.8:
-		return 'entertaining'  # 扑克牌是娱乐场景的明确标志
-	
-	if chopsticks_score > 0 and scores['dining'] >= max(scores.values()) * 0.8:
-		return 'dining'  # 筷子配合其他餐具是用餐场景的明确标志
-	
-	if g(*work_items) >= 1:  # 多个工作物品同时出现
-		return 'work'
-	
-	# 在没有明确特征的情况下，选择得分最高的场景
-	max_score = max(scores.values())
-	if max_score > 0:
-		for scene, score in scores.items():
-			if score == max_score:
-				return scene
-	
-	# 默认情况
-	return 'nothing'
\ No newline at end of file
+	"""c 为 {名称: 计数}（Counter），返回 work / dining / entertaining / relax / nothing"""
+	return _DEFAULT_SCORER.decide(c)
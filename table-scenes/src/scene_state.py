@@ -0,0 +1,120 @@
+# 场景状态机 - 迟滞确认、强特征立即切换、无物品保持上一场景，以事件形式输出状态变化
+import time
+from collections import namedtuple
+
+# kind: hold      当前无物品，保持上一场景
+#       pending   场景可能变化，开始确认
+#       switch    场景切换（reason 为强特征物品或 "稳定"），调用方据此触发回调
+#       vanishing 当前场景的特征物品消失，开始计时
+#       reset     需要重置滑动窗口（reason 为 "稳定"、强特征原因，或特征物品消失时的信号特征名）
+SceneEvent = namedtuple("SceneEvent", "ts kind old new reason")
+
+_NO_EVENTS = ()
+
+
+class SceneStateMachine:
+    """把逐帧的场景判断变成稳定显示的场景和切换事件，每次更新 O(1)。
+
+    update(counts, ts):  用规则评分器判断场景后调用 transition
+    update_vector(vec, names, ts):  同上，输入为类别计数向量（MultiHorizonCounter.vector()），
+                         用绑定到 names 的评分器做一次矩阵-向量乘法，不经过 {名称: 计数}
+    transition(ts, scene, f, has_items):  已有逐帧判断和特征分数时直接推进状态（录像回放、调参）
+    两者都返回 (显示的场景, 事件元组)，没有事件时为空元组。
+
+    空场景名称、强特征切换信号和维持场景所需的信号都取自当前规则集（default / switching），
+    规则热替换后随之改变。
+
+    hysteresis_s:   非强特征的场景变化需要持续多久才确认切换
+    rules:          带 scorer 属性的对象（scene_rules.RuleWatcher），规则热加载后自动使用新评分器
+    reset_fullness: 稳定切换时窗口填充超过该比例则发出 reset
+    clock:          ts 为 None 时使用的时钟
+    """
+
+    def __init__(self, hysteresis_s, rules=None, reset_fullness=0.7, clock=time.time):
+        self.hysteresis_s = hysteresis_s
+        self.rules = rules
+        self.reset_fullness = reset_fullness
+        self.clock = clock
+        self.scene = None        # 已确认的场景
+        self.decision = None     # 最近一帧的规则判断
+        self.pending = False     # 是否正在确认场景变化 / 特征物品消失
+        self.since = 0.0         # pending 开始的时间
+        self._bound = None       # update_vector 使用的绑定评分器，规则替换或出现新类别时重建
+        self._bound_names = None
+        self._bound_n = 0
+
+    def reset(self):
+        self.scene, self.pending, self.since = None, False, 0.0
+
+    def update(self, counts, ts=None, fullness=0.0):
+        """counts 为 {名称: 计数}；fullness 为滑动窗口填充比例（win.get_buffer_fullness()）"""
+        scorer = self.rules.scorer
+        f = scorer.feature_scores(scorer.vector(counts))
+        scene = self.decision = scorer.decide_scores(f)
+        return self.transition(ts, scene, f.tolist(), sum(counts.values()) > 0, fullness)
+
+    def update_vector(self, vec, names, ts=None, fullness=0.0):
+        """vec 为按 names 顺序的类别计数向量（长度不少于 len(names)）"""
+        scorer = self.rules.scorer
+        n = len(names)
+        bound = self._bound
+        if bound is None or bound.scorer is not scorer or self._bound_names is not names or self._bound_n != n:
+            bound = self._bound = scorer.bind(names)
+            self._bound_names, self._bound_n = names, n
+        vec = vec[:n]
+        f = bound.feature_scores(vec)
+        scene = self.decision = scorer.decide_scores(f)
+        return self.transition(ts, scene, f.tolist(), bool(vec.any()), fullness)
+
+    def transition(self, ts, scene, f, has_items, fullness=0.0):
+        """scene 为本帧的规则判断；f 为当前规则集的特征分数列表（scorer.features 顺序）"""
+        scorer = self.rules.scorer
+        now = self.clock() if ts is None else ts
+        last = self.scene
+        if scene == last:
+            # 判断与当前场景相同：当前场景的特征物品消失但有其他物品时尽快重置窗口
+            keep = scorer.keep.get(last)
+            if keep is None or f[keep] > 0 or not has_items:
+                self.pending = False
+                return scene, _NO_EVENTS
+            if not self.pending:
+                self.pending, self.since = True, now
+                return scene, (SceneEvent(now, "vanishing", last, scene, scorer.features[keep]),)
+            if now - self.since >= self.hysteresis_s * 0.5:
+                self.pending = False
+                return scene, (SceneEvent(now, "reset", last, scene, scorer.features[keep]),)
+            return scene, _NO_EVENTS
+
+        # 当前无物品（可能被移出画面）时保持上一场景
+        if not has_items and last != scorer.default:
+            return last, (SceneEvent(now, "hold", last, scene, ""),)
+
+        # 规则集中的强特征信号按顺序检查；切换到非空场景也立即切换，切换到空场景需要迟滞确认
+        reason = None
+        for j, only, why in scorer.force:
+            if f[j] > 0 and (only is None or only == scene):
+                reason = why
+                break
+        else:
+            if scene != scorer.default:
+                reason = "场景改变"
+        if reason is not None:
+            self.scene, self.pending = scene, False
+            return scene, (SceneEvent(now, "switch", last, scene, reason), SceneEvent(now, "reset", last, scene, reason))
+
+        if not self.pending:
+            self.pending, self.since = True, now
+            return scene, (SceneEvent(now, "pending", last, scene, ""),)
+        if now - self.since >= self.hysteresis_s:
+            # 新场景已稳定足够长的时间；窗口中旧场景的历史较多时一并重置
+            self.scene, self.pending = scene, False
+            switch = SceneEvent(now, "switch", last, scene, "稳定")
+            if fullness > self.reset_fullness:
+                return scene, (switch, SceneEvent(now, "reset", last, scene, "稳定"))
+            return scene, (switch,)
+        return scene, _NO_EVENTS
+
+
+def load_scene_state(cfg_window, rules=None):
+    return SceneStateMachine(cfg_window["switch_hysteresis_s"], rules=rules,
+                             reset_fullness=cfg_window.get("reset_fullness", 0.7))
@@ -0,0 +1,215 @@
+# 流水线阶段 - 各阶段独立线程运行，阶段之间用有界队列连接
+import queue
+import threading
+import time
+
+_STOP = object()  # 结束标记，沿流水线向下传递
+
+
+class StageStats:
+    """单个阶段的处理统计：处理数、忙碌时间、吞吐量、数据在输入队列中的等待时间、丢弃数"""
+
+    def __init__(self, name):
+        self.name = name
+        self.lock = threading.Lock()
+        self.processed = 0
+        self.busy_s = 0.0
+        self.wait_s = 0.0       # 输入队列等待时间之和
+        self.waited = 0
+        self.max_wait_s = 0.0
+        self.dropped = 0        # drop_oldest 队列中被新数据挤掉的条数
+        self.started = time.monotonic()
+
+    def record(self, seconds):
+        with self.lock:
+            self.processed += 1
+            self.busy_s += seconds
+
+    def record_wait(self, seconds):
+        with self.lock:
+            self.waited += 1
+            self.wait_s += seconds
+            self.max_wait_s = max(self.max_wait_s, seconds)
+
+    def record_drop(self):
+        with self.lock:
+            self.dropped += 1
+
+    def snapshot(self, q=None):
+        with self.lock:
+            elapsed = max(time.monotonic() - self.started, 1e-9)
+            processed, busy_s = self.processed, self.busy_s
+            waited, wait_s, max_wait_s, dropped = self.waited, self.wait_s, self.max_wait_s, self.dropped
+        return {
+            "name": self.name,
+            "processed": processed,
+            "throughput": processed / elapsed,  # 每秒处理条数
+            "busy": busy_s / elapsed,           # 忙碌占比，接近 1 说明是瓶颈
+            "avg_ms": busy_s / processed * 1000 if processed else 0.0,
+            "occupancy": q.qsize() / q.maxsize if q is not None and q.maxsize > 0 else 0.0,
+            "queue_age_ms": wait_s / waited * 1000 if waited else 0.0,  # 数据进入本阶段前在队列中的平均等待
+            "max_queue_age_ms": max_wait_s * 1000,
+            "dropped": dropped,
+        }
+
+
+class Stage:
+    """一个处理阶段：从输入队列取数据，调用 fn，结果送入下游队列。
+
+    fn 返回 None 表示丢弃该条数据（不向下游传递）。
+    drop_oldest=True 时输入队列满不阻塞上游，而是丢弃队列中最旧的数据（实时摄像头，
+    瓶颈阶段总是处理最新的帧，不在队列中积压过期帧）。
+    """
+
+    def __init__(self, name, fn, maxsize=2, drop_oldest=False):
+        self.name = name
+        self.fn = fn
+        self.in_q = queue.Queue(maxsize=maxsize)
+        self.drop_oldest = drop_oldest
+        self.out_q = None
+        self.out_stage = None   # 下游阶段（最后一个阶段为 None，输出到 sink）
+        self.stats = StageStats(name)
+
+
+class StageGraph:
+    """source -> stage1 -> stage2 -> ... -> sink 的线性阶段图。
+
+    source 在独立线程中被反复调用，返回 None 表示输入结束；
+    队列满时上游阻塞（背压；drop_oldest 的阶段丢弃最旧数据），sink 队列由调用方通过 get() 消费。
+    队列中存放 (入队时间, 数据)，取出时记录等待时间。
+    """
+
+    def __init__(self, source, stages, sink_maxsize=2, sink_name="sink"):
+        self.source = source
+        self.stages = stages
+        self.sink = queue.Queue(maxsize=sink_maxsize)
+        self.source_stats = StageStats("source")
+        self.sink_stats = StageStats(sink_name)   # sink 的消费方（如主线程渲染）用它记录处理时间
+        self.stop_event = threading.Event()
+        self.error = None
+        self.threads = []
+        for up, down in zip(stages, stages[1:]):
+            up.out_q = down.in_q
+            up.out_stage = down
+        if stages:
+            stages[-1].out_q = self.sink
+
+    def _put(self, q, item, down=None):
+        """带背压的放入；停止后放弃等待。down 为 drop_oldest 的下游阶段时挤掉最旧的数据"""
+        entry = (time.monotonic(), item)
+        if down is not None and down.drop_oldest:
+            while True:
+                try:
+                    q.put_nowait(entry)
+                    return True
+                except queue.Full:
+                    try:
+                        q.get_nowait()
+                        down.stats.record_drop()
+                    except queue.Empty:
+                        pass
+        while True:
+            try:
+                q.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                if self.stop_event.is_set():
+                    return False
+
+    def _put_stop(self, q):
+        """向下游发送结束标记；正常结束时排队等待，停止时挤掉旧数据"""
+        if self._put(q, _STOP):
+            return
+        while True:
+            try:
+                q.put_nowait((time.monotonic(), _STOP))
+                return
+            except queue.Full:
+                try:
+                    q.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _run_source(self):
+        first_q = self.stages[0].in_q if self.stages else self.sink
+        try:
+            while not self.stop_event.is_set():
+                t0 = time.perf_counter()
+                item = self.source()
+                if item is None:
+                    break
+                self.source_stats.record(time.perf_counter() - t0)
+                if not self._put(first_q, item, self.stages[0] if self.stages else None):
+                    break
+        except Exception as e:
+            self.error = e
+            self.stop_event.set()
+        self._put_stop(first_q)
+
+    def _run_stage(self, stage):
+        while True:
+            try:
+                t_put, item = stage.in_q.get(timeout=0.1)
+            except queue.Empty:
+                if self.stop_event.is_set():
+                    break
+                continue
+            if item is _STOP:
+                break
+            stage.stats.record_wait(time.monotonic() - t_put)
+            t0 = time.perf_counter()
+            try:
+                result = stage.fn(item)
+            except Exception as e:
+                print(f"阶段 {stage.name} 出错: {e}")
+                self.error = e
+                self.stop_event.set()
+                break
+            stage.stats.record(time.perf_counter() - t0)
+            if result is not None and not self._put(stage.out_q, result, stage.out_stage):
+                break
+        self._put_stop(stage.out_q)
+
+    def start(self):
+        for stage in self.stages:
+            t = threading.Thread(target=self._run_stage, args=(stage,), name=f"stage-{stage.name}", daemon=True)
+            t.start()
+            self.threads.append(t)
+        t = threading.Thread(target=self._run_source, name="stage-source", daemon=True)
+        t.start()
+        self.threads.append(t)
+        return self
+
+    def get(self, timeout=None):
+        """从 sink 取一条结果；流水线结束时返回 None"""
+        while True:
+            try:
+                t_put, item = self.sink.get(timeout=0.1 if timeout is None else timeout)
+            except queue.Empty:
+                if timeout is not None:
+                    return None
+                continue
+            if item is _STOP:
+                return None
+            self.sink_stats.record_wait(time.monotonic() - t_put)
+            return item
+
+    def stats(self):
+        """返回各阶段的吞吐量和输入队列占用率（占用率高说明该阶段是瓶颈）"""
+        return [self.source_stats.snapshot()] + [s.stats.snapshot(s.in_q) for s in self.stages]
+
+    def stop(self):
+        self.stop_event.set()
+        for t in self.threads:
+            t.join(timeout=2)
+        self.threads = []
+
+
+def format_stats(stats):
+    """格式化阶段统计，便于打印"""
+    return " | ".join(
+        f"{s['name']}: {s['throughput']:.1f}/s busy={s['busy']:.0%} q={s['occupancy']:.0%}"
+        + (f" age={s['queue_age_ms']:.0f}ms" if s.get("queue_age_ms") else "")
+        + (f" dropped={s['dropped']}" if s.get("dropped") else "")
+        for s in stats
+    )
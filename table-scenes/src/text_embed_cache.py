@@ -0,0 +1,103 @@
+# YOLOE 文本提示 - 类别描述配置与文本嵌入磁盘缓存
+"""
+set_classes 每次启动都要用文本编码器重新计算所有类别描述的嵌入，冷启动很慢。
+这里按 (权重文件内容哈希, 类别描述列表) 生成缓存键，命中时直接把缓存的
+嵌入张量传给 set_classes，跳过文本编码器。
+"""
+
+import hashlib
+import json
+import os
+
+DEFAULT_CACHE_DIR = os.path.join("runs", "text_pe_cache")
+
+
+def file_digest(path, cache_dir=DEFAULT_CACHE_DIR):
+    """权重文件内容的 sha256。
+
+    按 (路径, 大小, 修改时间) 记住上次的结果，文件未变时不必重新读取整个文件。
+    """
+    st = os.stat(path)
+    stamp = f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}"
+    index_path = os.path.join(cache_dir, "digests.json")
+    index = {}
+    if os.path.exists(index_path):
+        try:
+            index = json.load(open(index_path, encoding="utf-8"))
+        except (OSError, ValueError):
+            index = {}
+    if stamp in index:
+        return index[stamp]
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    index[stamp] = digest
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(index_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2)
+    return digest
+
+
+def cache_key(weights_path, names, cache_dir=DEFAULT_CACHE_DIR):
+    payload = json.dumps({"weights": file_digest(weights_path, cache_dir), "names": list(names)}, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32]
+
+
+def load_text_pe(model, weights_path, names, cache_dir=DEFAULT_CACHE_DIR):
+    """返回 names 的文本嵌入，优先读缓存，未命中时计算并写入缓存"""
+    import torch
+
+    path = os.path.join(cache_dir, cache_key(weights_path, names, cache_dir) + ".pt")
+    try:
+        device = next(model.model.parameters()).device
+    except (AttributeError, StopIteration):
+        device = "cpu"
+    if os.path.exists(path):
+        try:
+            pe = torch.load(path, map_location=device)
+            print(f"文本嵌入缓存命中: {path}")
+            return pe
+        except Exception as e:
+            print(f"读取文本嵌入缓存失败，重新计算: {e}")
+
+    print(f"计算 {len(names)} 个类别描述的文本嵌入...")
+    pe = model.get_text_pe(list(names))
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp = path + ".tmp"
+    torch.save(pe.detach().cpu(), tmp)
+    os.replace(tmp, path)  # 先写临时文件再替换，避免中断时留下损坏的缓存
+    print(f"文本嵌入已缓存到: {path}")
+    return pe
+
+
+def set_classes_cached(model, weights_path, names, cache_dir=DEFAULT_CACHE_DIR):
+    """等价于 model.set_classes(names)，但文本嵌入走磁盘缓存"""
+    model.set_classes(list(names), load_text_pe(model, weights_path, names, cache_dir))
+
+
+def load_prompt_groups(path):
+    """读取 prompts.yaml，返回有序的 {规范类别: [描述变体...]}"""
+    import yaml
+
+    spec = yaml.safe_load(open(path, encoding="utf-8"))
+    groups = {name: [name] for name in spec.get("standard", [])}
+    for name, variants in (spec.get("ensembles") or {}).items():
+        groups[name] = list(variants) or [name]
+    return groups
+
+
+def load_ensemble_pe(model, weights_path, groups, cache_dir=DEFAULT_CACHE_DIR):
+    """每个规范类别的变体嵌入取平均，返回 (规范类别列表, 嵌入)。
+
+    变体嵌入本身走 load_text_pe 的缓存。
+    """
+    import torch
+
+    variants = list(dict.fromkeys(v for vs in groups.values() for v in vs))
+    index = {v: i for i, v in enumerate(variants)}
+    pe = load_text_pe(model, weights_path, variants, cache_dir)  # (1, N, D)
+    merged = torch.stack([pe[0, [index[v] for v in vs]].mean(dim=0) for vs in groups.values()])
+    return list(groups), merged.unsqueeze(0)
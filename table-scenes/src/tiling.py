@@ -0,0 +1,80 @@
+# 分块推理 - ROI 区域切成重叠小块补充检测筷子、扑克牌等小物体
+import numpy as np
+
+from detections import Detections, batched_nms
+
+
+def tile_rects(x0, y0, x1, y1, tile=640, overlap=0.25):
+    """把区域切成边长 tile 的重叠方块 -> [(x0, y0, x1, y1)]
+
+    最后一行/列向内对齐区域边界，所有块尺寸相同（区域小于 tile 时取区域本身）。
+    """
+    def starts(lo, hi):
+        size = hi - lo
+        if size <= tile:
+            return [lo]
+        step = max(1, int(tile * (1 - overlap)))
+        out = list(range(lo, hi - tile, step))
+        out.append(hi - tile)
+        return out
+
+    tw, th = min(tile, x1 - x0), min(tile, y1 - y0)
+    return [(x, y, x + tw, y + th) for y in starts(y0, y1) for x in starts(x0, x1)]
+
+
+class Tiler:
+    """分块推理的参数和结果合并。
+
+    tile / overlap: 块边长（原图像素）和相邻块重叠比例
+    every_n: 每 N 帧做一次分块推理，其余帧只用整帧（或 ROI 裁剪）结果
+    classes: 分块结果只保留这些类别（标准化名称），None 表示全部
+    """
+
+    def __init__(self, tile=640, overlap=0.25, every_n=1, classes=None, iou=0.5, normalize=None):
+        self.tile = tile
+        self.overlap = overlap
+        self.every_n = max(1, every_n)
+        self.classes = set(classes) if classes else None
+        self.iou = iou
+        self.normalize = normalize or (lambda name: name)
+        self._rects = {}
+        self._names_src = None
+        self._keep_ids = None
+
+    def due(self, frame_index):
+        return frame_index % self.every_n == 0
+
+    def rects(self, shape, crop=None):
+        """整帧或裁剪区域内的分块，按 (画面尺寸, 裁剪区域) 缓存"""
+        key = (shape[:2], crop)
+        if key not in self._rects:
+            h, w = shape[:2]
+            x0, y0, x1, y1 = crop if crop is not None else (0, 0, w, h)
+            x0, y0, x1, y1 = max(0, x0), max(0, y0), min(w, x1), min(h, y1)
+            self._rects[key] = tile_rects(x0, y0, x1, y1, self.tile, self.overlap)
+        return self._rects[key]
+
+    def select(self, dets):
+        """只保留 classes 子集中的检测"""
+        if self.classes is None or len(dets) == 0:
+            return dets
+        if self._names_src is not dets.names:
+            self._names_src = dets.names
+            self._keep_ids = np.array([self.normalize(n) in self.classes for n in dets.names], dtype=bool)
+        return dets[self._keep_ids[dets.cls_id]]
+
+    def merge(self, full, tiles):
+        """整帧结果与分块结果合并，按类别 NMS 去掉重叠块和整帧之间的重复框"""
+        if len(tiles) == 0:
+            return full
+        dets = Detections.concat([full, tiles], full.names or tiles.names)
+        return dets[batched_nms(dets.xyxy, dets.conf, dets.cls_id, self.iou)]
+
+
+def load_tiler(model_cfg, normalize=None):
+    """model.tiling.enabled 时返回 Tiler，否则返回 None"""
+    cfg = model_cfg.get("tiling") or {}
+    if not cfg.get("enabled", False):
+        return None
+    return Tiler(tile=cfg.get("tile", 640), overlap=cfg.get("overlap", 0.25), every_n=cfg.get("every_n", 1),
+                 classes=cfg.get("classes"), iou=cfg.get("iou", model_cfg.get("iou", 0.5)), normalize=normalize)
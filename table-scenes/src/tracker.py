@@ -0,0 +1,166 @@
+# 多目标跟踪 - IoU 关联 + 卡尔曼滤波（纯 NumPy），检测器可以每 N 帧运行一次
+import numpy as np
+
+_NDIM = 4  # 状态: cx, cy, w, h 及其速度
+_F = np.eye(2 * _NDIM, dtype=np.float64)
+_F[:_NDIM, _NDIM:] = np.eye(_NDIM)   # 匀速模型，时间步为一帧
+_H = np.eye(_NDIM, 2 * _NDIM, dtype=np.float64)
+_STD_POS = 1 / 20     # 位置噪声相对框尺寸的比例
+_STD_VEL = 1 / 160    # 速度噪声相对框尺寸的比例
+
+
+def xyxy_to_cxcywh(xyxy):
+    xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+    wh = xyxy[:, 2:] - xyxy[:, :2]
+    return np.concatenate([xyxy[:, :2] + wh / 2, wh], axis=1)
+
+
+def cxcywh_to_xyxy(b):
+    wh = np.maximum(b[:, 2:4], 1.0)
+    return np.concatenate([b[:, :2] - wh / 2, b[:, :2] + wh / 2], axis=1)
+
+
+def iou_matrix(a, b):
+    """(N, 4) x (M, 4) xyxy -> (N, M)"""
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = (rb - lt).clip(0).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).clip(0).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).clip(0).prod(axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def greedy_match(iou, thres):
+    """按 IoU 从大到小贪心匹配 -> (行下标, 列下标)"""
+    rows, cols = np.nonzero(iou >= thres)
+    order = np.argsort(-iou[rows, cols], kind="stable")
+    used_r, used_c = set(), set()
+    out_r, out_c = [], []
+    for r, c in zip(rows[order].tolist(), cols[order].tolist()):
+        if r in used_r or c in used_c:
+            continue
+        used_r.add(r)
+        used_c.add(c)
+        out_r.append(r)
+        out_c.append(c)
+    return np.asarray(out_r, dtype=np.int64), np.asarray(out_c, dtype=np.int64)
+
+
+class Tracker:
+    """IoU 关联 + 卡尔曼滤波的多目标跟踪器，所有轨迹以数组形式批量更新。
+
+    step(dets)  有检测的帧：预测、与检测按类别做 IoU 匹配、更新，未匹配的检测开新轨迹
+    step(None)  跳过检测的帧：只用卡尔曼预测推进轨迹
+    step(None, static=True)  运动门控判定画面静止的帧：原样输出现有轨迹，不预测也不增加未匹配帧数
+    返回带 track_id 的 Detections（conf 为最近一次匹配的置信度）；
+    还没有见过任何检测结果时返回 None。
+
+    iou_thres: 关联所需的最小 IoU
+    max_age:   轨迹连续多少帧没有匹配到检测后删除
+    min_hits:  轨迹至少匹配几次才输出（过滤偶发误检）
+    """
+
+    def __init__(self, iou_thres=0.3, max_age=30, min_hits=1):
+        self.iou_thres = iou_thres
+        self.max_age = max_age
+        self.min_hits = min_hits
+        self.next_id = 1
+        self.names = ()
+        self._det_cls = None  # 输出沿用输入检测结果的类型（Detections），tracker 本身只依赖 NumPy
+        self.mean = np.zeros((0, 2 * _NDIM))
+        self.cov = np.zeros((0, 2 * _NDIM, 2 * _NDIM))
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.cls_id = np.zeros(0, dtype=np.int32)
+        self.conf = np.zeros(0, dtype=np.float32)
+        self.age = np.zeros(0, dtype=np.int64)    # 距上次匹配的帧数
+        self.hits = np.zeros(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def reset(self):
+        self.__init__(self.iou_thres, self.max_age, self.min_hits)
+
+    @staticmethod
+    def _noise(wh, pos, vel):
+        """按框尺寸缩放的对角噪声 (N, 2*_NDIM, 2*_NDIM)"""
+        std = np.concatenate([pos * wh, pos * wh, vel * wh, vel * wh], axis=1)  # (N, 8)
+        return np.einsum("ni,ij->nij", std ** 2, np.eye(2 * _NDIM))
+
+    def _predict(self):
+        if not len(self):
+            return
+        wh = np.maximum(self.mean[:, 2:4], 1.0)
+        self.mean = self.mean @ _F.T
+        self.cov = _F @ self.cov @ _F.T + self._noise(wh, _STD_POS, _STD_VEL)
+        self.age += 1
+
+    def _update(self, idx, z):
+        """已匹配的轨迹 idx 用观测 z (M, 4) 批量更新"""
+        mean, cov = self.mean[idx], self.cov[idx]
+        wh = np.maximum(z[:, 2:4], 1.0)
+        r = (_STD_POS * np.concatenate([wh, wh], axis=1)) ** 2
+        s = _H @ cov @ _H.T + np.einsum("ni,ij->nij", r, np.eye(_NDIM))
+        k = cov @ _H.T @ np.linalg.inv(s)                          # (M, 8, 4)
+        self.mean[idx] = mean + np.einsum("nij,nj->ni", k, z - mean @ _H.T)
+        self.cov[idx] = cov - k @ _H @ cov
+
+    def _add(self, z, cls_id, conf):
+        n = len(z)
+        wh = np.maximum(z[:, 2:4], 1.0)
+        mean = np.concatenate([z, np.zeros((n, _NDIM))], axis=1)
+        cov = self._noise(wh, 2 * _STD_POS, 10 * _STD_VEL)
+        self.mean = np.concatenate([self.mean, mean])
+        self.cov = np.concatenate([self.cov, cov])
+        self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + n)])
+        self.next_id += n
+        self.cls_id = np.concatenate([self.cls_id, cls_id.astype(np.int32)])
+        self.conf = np.concatenate([self.conf, conf.astype(np.float32)])
+        self.age = np.concatenate([self.age, np.zeros(n, dtype=np.int64)])
+        self.hits = np.concatenate([self.hits, np.ones(n, dtype=np.int64)])
+
+    def step(self, dets=None, static=False):
+        if static and dets is None:
+            # 画面没有变化时物体也没有移动，轨迹不应因为没有检测而老化删除
+            return self.tracks()
+        self._predict()
+        if dets is not None:
+            self.names = dets.names
+            self._det_cls = type(dets)
+            z = xyxy_to_cxcywh(dets.xyxy)
+            matched_det = np.zeros(len(dets), dtype=bool)
+            if len(self) and len(dets):
+                iou = iou_matrix(cxcywh_to_xyxy(self.mean), dets.xyxy.astype(np.float64))
+                iou[self.cls_id[:, None] != dets.cls_id[None, :]] = 0.0  # 只在同类别之间关联
+                ti, di = greedy_match(iou, self.iou_thres)
+                if len(ti):
+                    self._update(ti, z[di])
+                    self.conf[ti] = dets.conf[di]
+                    self.age[ti] = 0
+                    self.hits[ti] += 1
+                    matched_det[di] = True
+            new = ~matched_det
+            if new.any():
+                self._add(z[new], dets.cls_id[new], dets.conf[new])
+        # 删除长时间未匹配的轨迹
+        alive = self.age <= self.max_age
+        if not alive.all():
+            for name in ("mean", "cov", "ids", "cls_id", "conf", "age", "hits"):
+                setattr(self, name, getattr(self, name)[alive])
+        return self.tracks()
+
+    def tracks(self):
+        if self._det_cls is None:
+            return None
+        show = self.hits >= self.min_hits
+        return self._det_cls(cxcywh_to_xyxy(self.mean[show]), self.conf[show], self.cls_id[show], self.names,
+                             self.ids[show])
+
+
+def load_tracker(cfg_tracker):
+    """tracker.enabled 时返回 (Tracker, 检测间隔)，否则返回 (None, 1)"""
+    if not cfg_tracker or not cfg_tracker.get("enabled", False):
+        return None, 1
+    tracker = Tracker(iou_thres=cfg_tracker.get("iou", 0.3), max_age=cfg_tracker.get("max_age", 30),
+                      min_hits=cfg_tracker.get("min_hits", 1))
+    return tracker, max(1, cfg_tracker.get("detect_interval", 3))
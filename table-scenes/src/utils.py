@@ -8,25 +8,18 @@
 5. NOLIGHT: (画面静止且无人，且不属于前4种)
 """
 
-WORK_ITEMS = {"laptop", "mouse", "keyboard", "book", "newspaper"}
-DINING_ITEMS = {"chopsticks", "bowl", "plate", "spoon", "fork"}
-ENTERTAIN_ITEMS = {"painter", "paint", "chess"}
-RELAX_ITEMS = {"cup", "person"}
+from scene_rules import PRIORITY_RULES, compile_rules
+
+WORK_ITEMS = set(PRIORITY_RULES["groups"]["work"])
+DINING_ITEMS = set(PRIORITY_RULES["groups"]["dining"])
+ENTERTAIN_ITEMS = set(PRIORITY_RULES["groups"]["entertain"])
+RELAX_ITEMS = set(PRIORITY_RULES["groups"]["relax"])
+
+# 以上规则编译为权重矩阵 + 覆盖条件（见 scene_rules.PRIORITY_RULES）
+_SCORER = compile_rules(PRIORITY_RULES)
+
 
 def decide_scene(counts, is_static=False):
-    # 1. WORK
-    if any(counts.get(item, 0) > 0 for item in WORK_ITEMS):
-        return "WORK"
-    # 2. DINING
-    if sum(counts.get(item, 0) > 0 for item in DINING_ITEMS) >= 2:
-        return "DINING"
-    # 3. ENTERTAINING
-    if any(counts.get(item, 0) > 0 for item in ENTERTAIN_ITEMS):
-        return "ENTERTAINING"
-    # 4. RELAX
-    if any(counts.get(item, 0) > 0 for item in RELAX_ITEMS):
-        return "RELAX"
-    # 5. NOLIGHT
-    if is_static and counts.get("person", 0) == 0:
-        return "NOLIGHT"
-    return "NOLIGHT"
+    # 依次检查 WORK / DINING / ENTERTAINING / RELAX 的出现物品数，都不满足时为 NOLIGHT
+    # （is_static 只影响 NOLIGHT 的判定理由，结果相同）
+    return _SCORER.decide(counts)
@@ -18,7 +18,7 @@ def draw_detections(frame, detections):
 	"""在画面中框出检测到的物体
 	Args:
 		frame: 视频帧
-		detections: 检测结果列表，每个元素包含 'name', 'xyxy', 'conf' 等键
+		detections: Detections，或检测结果列表（每个元素包含 'name', 'xyxy', 'conf' 等键）
 	"""
 	colors = {
 		'person': (0, 255, 0),    # 绿色
@@ -36,14 +36,17 @@ def draw_detections(frame, detections):
 		'knife': (128, 128, 0)    # 深绿色
 	}
 	
-	for det in detections:
+	if hasattr(detections, 'cls_id'):
+		# Detections：直接从数组取值，不构造逐框 dict
+		names = detections.names
+		items = zip([names[i] for i in detections.cls_id.tolist()],
+					detections.xyxy.astype(int).tolist(), detections.conf.tolist())
+	else:
+		items = ((det['name'], list(map(int, det['xyxy'])), det['conf']) for det in detections)
+
+	for name, box, conf in items:
 		# 获取物体类别和坐标
-		name = det['name']
-		box = det['xyxy']
-		conf = det['conf']
-		
-		# 转换为整数坐标
-		x1, y1, x2, y2 = map(int, box)
+		x1, y1, x2, y2 = box
 		
 		# 确定颜色 (默认白色)
 		color = colors.get(name, (255, 255, 255))
@@ -4,6 +4,7 @@ import cv2
 import time
 import numpy as np
 from ultralytics import YOLOE
+from text_embed_cache import set_classes_cached
 
 # 添加CLIP-main目录到Python路径
 clip_path = "D:\\portfolio\\table-scenes\\CLIP-main"
@@ -35,7 +36,7 @@ print(f"设置检测类别: {', '.join(names)}")
 
 # 设置类别
 try:
-    model.set_classes(names, model.get_text_pe(names))
+    set_classes_cached(model, model_path, names)  # 文本嵌入走磁盘缓存
     print("成功设置检测类别")
 except Exception as e:
     print(f"设置类别时发生错误: {e}")
@@ -12,6 +12,7 @@ import numpy as np
 import time
 import cv2
 from ultralytics import YOLOE
+from text_embed_cache import set_classes_cached
 
 # 添加CLIP库路径
 clip_path = "D:\\portfolio\\table-scenes\\CLIP-main"
@@ -96,14 +97,15 @@ def build_complete_class_list():
 def initialize_model_with_enhanced_descriptions():
     # 加载模型
     
-    model = YOLOE("yoloe-11l-seg.pt")
+    model_path = "yoloe-11l-seg.pt"
+    model = YOLOE(model_path)
     
     # 构建丰富的类别描述列表
     all_class_descriptions = build_complete_class_list()
     
     # 设置类别名称和文本嵌入
     print(f"设置增强的类别描述 (共 {len(all_class_descriptions)} 个描述)...")
-    model.set_classes(all_class_descriptions)
+    set_classes_cached(model, model_path, all_class_descriptions)  # 文本嵌入走磁盘缓存
     print("类别描述设置完成")
     
     print("\n模型准备就绪 - 仅使用文本提示增强，没有视觉提示")
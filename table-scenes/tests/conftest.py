@@ -0,0 +1,6 @@
+# src 下的模块按同级导入编写（python src/xxx.py 运行），测试时把 src 加入模块搜索路径，
+# 使依赖其他模块的 tiling、batch_score 等也能直接导入
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
@@ -1,5 +1,11 @@
 # 测试聚合器
-from src.aggregator import SlidingCounter
+import math
+from collections import Counter
+
+import numpy as np
+
+from src.aggregator import MultiHorizonCounter, SlidingCounter
+from src.detections import Detections
 
 
 def test_sliding_counter_basic():
@@ -7,4 +13,57 @@ def test_sliding_counter_basic():
 	for _ in range(5):
 		win.update_and_sum(['cup'])
 	counts = win.update_and_sum(['cup'])
-	assert counts['cup'] >= 6
\ No newline at end of file
+	assert counts['cup'] >= 6
+
+def test_incremental_total_matches_full_sum():
+	win = SlidingCounter(seconds=1, fps=4)
+	frames = [['cup'], ['cup', 'laptop'], [], ['poker'], ['book', 'book'], ['cup'], [], ['laptop']]
+	for i, names in enumerate(frames):
+		counts = win.update_and_sum(names)
+		expected = Counter()
+		for f in frames[max(0, i - 3):i + 1]:
+			expected.update(win.normalize_detection_name(n) for n in f)
+		assert counts == expected
+		assert all(v > 0 for v in counts.values())
+	assert win.get_buffer_fullness() == 1.0
+	win.reset()
+	assert win.get_buffer_fullness() == 0 and win.update_and_sum(['cup']) == {'cup': 1}
+
+
+def test_time_window_evicts_by_timestamp():
+	win = SlidingCounter(seconds=1.0, fps=30, mode='time')
+	assert win.update_and_sum(['cup'], ts=0.0) == {'cup': 1}
+	assert win.update_and_sum(['cup'], ts=0.5) == {'cup': 2}
+	assert win.get_buffer_fullness() == 0.5
+	# 帧率很低时窗口仍只覆盖最近 1 秒
+	assert win.update_and_sum(['laptop'], ts=1.2) == {'cup': 1, 'laptop': 1}
+	assert win.update_and_sum([], ts=5.0) == {}
+	assert win.get_buffer_fullness() == 1.0
+
+
+def test_time_window_exponential_decay():
+	win = SlidingCounter(seconds=10, mode='time', decay_s=1.0)
+	win.update_and_sum(['cup'], ts=0.0)
+	counts = win.update_and_sum(['cup'], ts=1.0)
+	assert abs(counts['cup'] - (1 + math.exp(-1))) < 1e-9
+	counts = win.update_and_sum([], ts=10.5)
+	assert 'cup' not in counts or counts['cup'] < 1e-3
+
+
+def test_multi_horizon_counter_matches_time_windows():
+	names = ('cup', 'poker', 'playing cards', 'laptop')
+	multi = MultiHorizonCounter(seconds=1, horizons=(5,), fps=2, ewma_s=2.0)
+	ref = {h: SlidingCounter(seconds=h, mode='time') for h in (1, 5)}
+	rng = np.random.default_rng(0)
+	for i in range(200):  # 超过预估容量，触发扩容
+		ts = i * 0.1
+		cls_id = rng.integers(0, len(names), rng.integers(0, 4))
+		dets = Detections(np.zeros((len(cls_id), 4)), np.ones(len(cls_id)), cls_id, names)
+		counts = multi.update_and_sum(dets, ts)
+		for h, win in ref.items():
+			assert multi.counts(h) == win.update_and_sum(dets, ts)
+	assert counts == multi.counts(1)
+	assert set(multi.ewma_counts()) <= {'cup', 'poker cards', 'laptop'}
+	multi.reset()
+	assert multi.get_buffer_fullness() == 0
+	assert multi.update_and_sum(['cup', 'book'], 30.0) == {'cup': 1, 'book': 1}
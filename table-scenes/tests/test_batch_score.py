@@ -0,0 +1,31 @@
+# 测试离线评分的输入遍历和分批
+import cv2
+import numpy as np
+
+from batch_score import batched, iter_inputs
+
+
+def test_batched_keeps_order_and_remainder():
+	assert list(batched(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+	assert list(batched([], 3)) == []
+
+
+def test_iter_inputs_images_then_videos(tmp_path):
+	for i in range(2):
+		cv2.imwrite(str(tmp_path / f'{i}.jpg'), np.full((48, 64, 3), i * 50, dtype=np.uint8))
+	(tmp_path / 'notes.txt').write_text('skip')
+	writer = cv2.VideoWriter(str(tmp_path / 'clip.avi'), cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+	for i in range(6):
+		writer.write(np.full((48, 64, 3), i * 10, dtype=np.uint8))
+	writer.release()
+
+	items = list(iter_inputs([str(tmp_path)], stride=2))
+	sources = [s for s, _, _ in items]
+	assert sources[:2] == [str(tmp_path / '0.jpg'), str(tmp_path / '1.jpg')]
+	assert sources[2:] == [str(tmp_path / 'clip.avi')] * 3
+	assert all(ts == 0.0 for _, ts, _ in items[:2])
+	stamps = [ts for _, ts, _ in items[2:]]
+	assert stamps == sorted(stamps)
+	assert all(frame.shape == (48, 64, 3) for _, _, frame in items)
+	# 按 batch_size 分批后帧数不变
+	assert sum(len(b) for b in batched(iter_inputs([str(tmp_path)], 2), 4)) == 5
@@ -0,0 +1,131 @@
+# 测试采集线程
+import time
+from src.capture import FrameGrabber
+
+
+class FakeCap:
+	def __init__(self, n):
+		self.n = n
+		self.i = 0
+
+	def read(self):
+		if self.i >= self.n:
+			return False, None
+		self.i += 1
+		time.sleep(0.001)
+		return True, self.i
+
+	def release(self):
+		pass
+
+
+def test_grabber_returns_latest_and_counts_drops():
+	grabber = FrameGrabber(FakeCap(20), buffer_size=2).start()
+	time.sleep(0.2)
+	ok, frame, ts = grabber.read(timeout=0.5)
+	assert ok and frame == 20 and ts is not None
+	assert grabber.stats()['dropped'] == 19
+	ok, _, _ = grabber.read(timeout=0.5)
+	assert not ok
+	grabber.release()
+
+
+def test_video_file_source_stride_uses_stream_timestamps(tmp_path):
+	import cv2
+	import numpy as np
+	from src.capture import VideoFileSource
+
+	path = str(tmp_path / 'clip.avi')
+	writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+	for i in range(20):
+		writer.write(np.full((48, 64, 3), i * 10, dtype=np.uint8))
+	writer.release()
+
+	src = VideoFileSource(str(tmp_path), stride=4)
+	assert src.fps == 2.5
+	stamps = []
+	while True:
+		ok, frame, ts = src.read()
+		if not ok:
+			break
+		stamps.append(round(ts, 2))
+	src.release()
+	assert len(stamps) == 5
+	assert stamps == sorted(stamps) and stamps[-1] - stamps[0] >= 1.5
+	assert src.stats() == {'grabbed': 5, 'dropped': 15}
+
+
+def test_window_from_file_source_fps(tmp_path):
+	# 录像回放的有效帧率是浮点数（stream_fps / stride），窗口长度须取整
+	import cv2
+	import numpy as np
+	from src.aggregator import load_window
+	from src.capture import VideoFileSource
+
+	path = str(tmp_path / 'clip.avi')
+	writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+	for i in range(6):
+		writer.write(np.full((48, 64, 3), i * 10, dtype=np.uint8))
+	writer.release()
+
+	src = VideoFileSource(str(tmp_path), stride=4)
+	assert isinstance(src.fps, float)
+	for mode in ('frames', 'time', 'multi'):
+		win = load_window({'seconds': 1, 'mode': mode}, src.fps)
+		counts = win.update_and_sum(['cup'], 0.0)
+		assert counts['cup'] == 1
+	src.release()
+
+
+def test_nonblocking_read_is_a_transient_miss():
+	# 多摄像头模式用 read(timeout=0) 轮询：暂时没有新帧不等于源结束
+	grabber = FrameGrabber(FakeCap(3), buffer_size=2).start()
+	time.sleep(0.05)
+	ok, frame, _ = grabber.read(timeout=0)
+	assert ok and frame == 3
+	ok, _, _ = grabber.read(timeout=0)
+	assert not ok
+	time.sleep(0.05)
+	assert grabber.finished
+	grabber.release()
+
+	class StalledCap(FakeCap):
+		def read(self):
+			time.sleep(0.05)
+			return super().read()
+
+	grabber = FrameGrabber(StalledCap(100)).start()
+	ok, _, _ = grabber.read(timeout=0)
+	assert not ok and not grabber.finished
+	ok, _, _ = grabber.read(timeout=0.5)
+	assert ok
+	grabber.release()
+
+
+def test_source_finished_only_at_end_of_stream(tmp_path):
+	import cv2
+	import numpy as np
+	from src.capture import VideoFileSource
+
+	path = str(tmp_path / 'clip.avi')
+	writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 10, (64, 48))
+	for i in range(3):
+		writer.write(np.full((48, 64, 3), i * 10, dtype=np.uint8))
+	writer.release()
+	src = VideoFileSource(path)
+	while not src.finished:
+		ok, _, _ = src.read()
+	assert not ok and src.finished
+	src.release()
+
+	# 摄像头读超时不算结束；停止抓帧后消费端不再等待
+	class StalledCap(FakeCap):
+		def read(self):
+			time.sleep(0.2)
+			return super().read()
+
+	grabber = FrameGrabber(StalledCap(100)).start()
+	ok, _, _ = grabber.read(timeout=0.05)
+	assert not ok and not grabber.finished
+	grabber.release()
+	assert grabber.finished
@@ -0,0 +1,60 @@
+# 测试列式检测结果、ROI 过滤和聚合
+import numpy as np
+
+from src.aggregator import SlidingCounter
+from src.detections import Detections, batched_nms
+from src.roi import Roi
+
+NAMES = ('cup', 'laptop', 'playing cards')
+
+
+def make_dets():
+	return Detections([[10, 10, 20, 20], [100, 100, 140, 160], [300, 300, 320, 330]], [0.9, 0.8, 0.7], [0, 2, 2], NAMES)
+
+
+def test_detections_iterates_as_dicts():
+	dets = make_dets()
+	assert len(dets) == 3
+	first = next(iter(dets))
+	assert first['name'] == 'cup' and first['xyxy'] == [10.0, 10.0, 20.0, 20.0]
+	assert dets.name_list() == ['cup', 'playing cards', 'playing cards']
+	assert dets.class_counts().tolist() == [1, 0, 2]
+
+
+def test_roi_filter_matches_point_test():
+	roi = Roi([[0, 0], [200, 0], [200, 200], [0, 200]])
+	dets = make_dets()
+	kept = roi.filter(dets)
+	assert kept.name_list() == ['cup', 'playing cards']
+	assert [roi(d['xyxy']) for d in dets] == roi.contains(dets.xyxy).tolist()
+	assert len(roi.filter(dets.to_dicts())) == 2
+
+
+def test_roi_contains_matches_point_test_on_edges():
+	import numpy as np
+	rng = np.random.default_rng(0)
+	# 配置中的 ROI 和一个凹多边形；随机框 + 各条边附近（含边上）的框中心
+	for poly in ([[80, 120], [1200, 120], [1250, 700], [60, 700]],
+				 [[0, 0], [100, 50], [200, 0], [150, 200], [100, 100], [50, 200]]):
+		roi = Roi(poly)
+		xyxy = rng.uniform(-20, 1300, size=(5000, 4))
+		a = np.array(poly)
+		t = rng.uniform(0, 1, size=(2000, 1))
+		edge = np.concatenate([a[i] + t * (a[(i + 1) % len(a)] - a[i]) for i in range(len(a))])
+		edge = np.round(edge) + rng.integers(-2, 3, size=edge.shape)
+		xyxy = np.concatenate([xyxy, np.concatenate([edge, edge], axis=1)])
+		assert roi.contains(xyxy).tolist() == [roi(b) for b in xyxy]
+
+
+def test_sliding_counter_accepts_detections():
+	win = SlidingCounter(seconds=1, fps=2)
+	counts = win.update_and_sum(make_dets())
+	assert counts == {'cup': 1, 'poker cards': 2}
+
+
+def test_batched_nms_keeps_other_classes():
+	xyxy = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [0, 0, 10, 10]], dtype=np.float32)
+	conf = np.array([0.9, 0.8, 0.7], dtype=np.float32)
+	cls_id = np.array([0, 0, 1])
+	# 同类别重叠框被抑制，不同类别的重叠框保留
+	assert batched_nms(xyxy, conf, cls_id, iou_thres=0.5).tolist() == [0, 2]
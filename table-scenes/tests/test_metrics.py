@@ -0,0 +1,24 @@
+# 测试性能指标
+from src.metrics import Metrics
+
+
+def test_histogram_quantiles_and_prometheus_text():
+	m = Metrics()
+	for i in range(1, 101):
+		m.observe('model_forward', i / 1000.0)
+	s = m.to_dict()['stages']['model_forward']
+	assert s['count'] == 100
+	assert 40 <= s['p50_ms'] <= 60
+	assert 90 <= s['p99_ms'] <= 100
+	m.set_gauge('motion_skip_rate', 0.5)
+	text = m.to_prometheus()
+	assert 'table_scenes_stage_latency_seconds_count{stage="model_forward"} 100' in text
+	assert 'table_scenes_stage_latency_seconds_bucket{stage="model_forward",le="+Inf"} 100' in text
+	assert 'table_scenes_motion_skip_rate 0.5' in text
+
+
+def test_disabled_metrics_record_nothing():
+	m = Metrics(enabled=False)
+	with m.timer('render'):
+		pass
+	assert m.to_dict()['stages'] == {}
@@ -0,0 +1,36 @@
+# 测试运动门控
+import numpy as np
+from src.motion import MotionGate
+
+
+def test_static_frames_are_skipped_until_refresh():
+	gate = MotionGate(width=64, refresh_every=5)
+	frame = np.full((360, 640, 3), 100, dtype=np.uint8)
+	decisions = [gate.should_infer(frame) for _ in range(10)]
+	assert decisions == [True, False, False, False, False, True, False, False, False, False]
+	assert gate.skip_rate == 0.8
+
+
+def test_change_outside_roi_is_ignored():
+	gate = MotionGate(polygon=[[0, 0], [320, 0], [320, 360], [0, 360]], width=64, refresh_every=100)
+	frame = np.full((360, 640, 3), 100, dtype=np.uint8)
+	assert gate.should_infer(frame)
+	moved = frame.copy()
+	moved[:, 400:] = 255
+	assert not gate.should_infer(moved)
+	moved[:, :200] = 255
+	assert gate.should_infer(moved)
+
+
+def test_reference_advances_only_after_commit():
+	gate = MotionGate(width=64, refresh_every=100)
+	frame = np.full((360, 640, 3), 100, dtype=np.uint8)
+	assert gate.should_infer(frame)
+	moved = frame.copy()
+	moved[:, :320] = 255
+	# 推理请求被丢弃（未 commit）：参考帧仍是上一次实际推理的画面，下一帧再次判定为变化
+	assert gate.should_infer(moved, commit=False)
+	assert gate.should_infer(moved, commit=False)
+	gate.commit()
+	assert not gate.should_infer(moved)
+	assert not gate.would_infer(gate.prepare(moved))
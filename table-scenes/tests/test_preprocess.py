@@ -0,0 +1,42 @@
+# 测试预处理：查找表增强、缓冲区复用和坐标还原
+import cv2
+import numpy as np
+
+from src.detections import Detections
+from src.preprocess import Preprocessor, make_lut, restore_boxes
+from src.roi import Roi
+
+
+def test_lut_matches_convert_scale_abs():
+	x = np.arange(256, dtype=np.uint8).reshape(1, 256)
+	assert (make_lut(1.5, -20) == cv2.convertScaleAbs(x, alpha=1.5, beta=-20)).all()
+
+
+def test_resize_then_lut_into_reused_buffers():
+	frame = np.random.default_rng(0).integers(0, 256, (1080, 1920, 3), dtype=np.uint8)
+	pre = Preprocessor(640, alpha=1.2, beta=10, n_buffers=2)
+	a, b, c = pre(frame), pre(frame), pre(frame)
+	assert a.image.shape == (360, 640, 3) and a.image is c.image and a.image is not b.image
+	ref = cv2.resize(cv2.convertScaleAbs(frame, alpha=1.2, beta=10), (640, 360))
+	assert np.abs(c.image.astype(int) - ref).max() <= 1
+
+
+def test_letterbox_and_restore_boxes():
+	frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+	prep = Preprocessor(640, letterbox=True)(frame)
+	assert prep.image.shape == (640, 640, 3) and prep.pad == (0, 140)
+	assert (prep.image[0, 0] == 114).all()
+	dets = Detections([[0, 140, 64, 176]], [0.9], [0], ('cup',))
+	assert restore_boxes(dets, prep).xyxy.tolist() == [[0, 0, 192, 108]]
+
+
+def test_crop_maps_boxes_back_to_full_frame():
+	frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+	roi = Roi([[80, 120], [1200, 120], [1250, 700], [60, 700]])
+	crop = roi.crop_rect(pad=32)
+	assert crop == (28, 88, 1283, 733)
+	prep = Preprocessor(640)(frame, crop)
+	assert prep.image.shape[1] == 640 and prep.offset == (28, 88)
+	dets = Detections([[0, 0, 64, 64]], [0.9], [0], ('cup',))
+	box = restore_boxes(dets, prep).xyxy[0]
+	assert np.allclose(box, [28, 88, 28 + 64 / prep.scale, 88 + 64 / prep.scale])
@@ -0,0 +1,21 @@
+# 测试渲染器的限速绘制和按键处理
+from collections import Counter
+
+import numpy as np
+
+import render
+from detections import Detections
+from render import Renderer
+
+
+def test_rate_limited_frames_still_poll_keys(monkeypatch):
+	shown, keys = [], iter([-1, -1, ord('q')])
+	monkeypatch.setattr(render.cv2, 'imshow', lambda name, frame: shown.append(name))
+	monkeypatch.setattr(render.cv2, 'waitKey', lambda delay: next(keys))
+	r = Renderer({'enabled': False}, max_fps=1, mode='inline')
+	frame = np.zeros((48, 64, 3), dtype=np.uint8)
+	for _ in range(3):
+		r.submit(frame, Detections.empty(), 'work', Counter())
+	# 只绘制了第一帧，之后被限速跳过的帧仍然响应 q
+	assert len(shown) == 1 and r.drawn == 1
+	assert r.quit_requested
@@ -0,0 +1,119 @@
+# 测试编译后的场景评分器与原有规则逐一等价
+from collections import Counter
+
+import numpy as np
+
+from src.scene_rules import (CHOPSTICKS_TERMS, DEFAULT_RULES, POKER_TERMS, PRIORITY_RULES, compile_rules,
+	decide_scene)
+
+
+def legacy_decide_scene(c):
+	# 原 scene_rules.decide_scene 的逻辑
+	g = lambda *ks: sum(c.get(k, 0) for k in ks)
+	scores = {}
+	work_items = ['laptop', 'book', 'mouse', 'keyboard']
+	scores['work'] = g(*work_items) * 10
+	scores['dining'] = g('bowl', 'cup', 'wine glass', 'spoon', 'fork', 'knife', 'dining table') * 5
+	chopsticks_score = g(*CHOPSTICKS_TERMS) * 10
+	scores['dining'] += chopsticks_score
+	scores['entertaining'] = g('remote', 'cell phone', 'chess board', 'board game pieces') * 5
+	poker_score = g(*POKER_TERMS) * 15
+	scores['entertaining'] += poker_score
+	scores['relax'] = c.get('person', 0) * 3
+	scores['nothing'] = 1 if sum(scores.values()) == 0 else 0
+	if poker_score > 0 and poker_score >= max(scores.values()) * 0.8:
+		return 'entertaining'
+	if chopsticks_score > 0 and scores['dining'] >= max(scores.values()) * 0.8:
+		return 'dining'
+	if g(*work_items) >= 1:
+		return 'work'
+	max_score = max(scores.values())
+	if max_score > 0:
+		for scene, score in scores.items():
+			if score == max_score:
+				return scene
+	return 'nothing'
+
+
+def legacy_priority_scene(counts):
+	# 原 utils.decide_scene 的逻辑
+	groups = PRIORITY_RULES['groups']
+	if any(counts.get(i, 0) > 0 for i in groups['work']):
+		return 'WORK'
+	if sum(counts.get(i, 0) > 0 for i in groups['dining']) >= 2:
+		return 'DINING'
+	if any(counts.get(i, 0) > 0 for i in groups['entertain']):
+		return 'ENTERTAINING'
+	if any(counts.get(i, 0) > 0 for i in groups['relax']):
+		return 'RELAX'
+	return 'NOLIGHT'
+
+
+VOCAB = ['person', 'cup', 'bowl', 'laptop', 'book', 'remote', 'poker cards', 'playing cards', 'chopsticks',
+	'wooden chopsticks', 'spoon', 'plate', 'chess', 'newspaper', 'fork', 'dining table', 'tv']
+
+
+def random_counts(rng):
+	names = rng.choice(VOCAB, size=rng.integers(0, 6))
+	return Counter({str(n): int(rng.integers(1, 5)) for n in names})
+
+
+def test_compiled_default_rules_match_legacy():
+	rng = np.random.default_rng(0)
+	for _ in range(3000):
+		c = random_counts(rng)
+		assert decide_scene(c) == legacy_decide_scene(c), c
+
+
+def test_compiled_priority_rules_match_legacy():
+	scorer = compile_rules(PRIORITY_RULES)
+	rng = np.random.default_rng(1)
+	for _ in range(3000):
+		c = random_counts(rng)
+		assert scorer.decide(c) == legacy_priority_scene(c), c
+
+
+def test_bound_scorer_on_class_id_vector():
+	names = ('person', 'poker', 'cup', 'unknown')
+	bound = compile_rules(PRIORITY_RULES).bind(names)
+	assert bound.decide(np.array([1, 0, 0, 5])) == 'RELAX'
+	assert bound.decide(np.zeros(4)) == 'NOLIGHT'
+	assert compile_rules(DEFAULT_RULES).bind(names).decide(np.array([2, 1, 1, 0])) == 'entertaining'
+
+
+def test_yaml_rule_sets_match_builtin():
+	# config/scene_rules.yaml 与内置规则一致
+	import yaml
+	sets = yaml.safe_load(open('config/scene_rules.yaml', encoding='utf-8'))['rule_sets']
+	assert sets['default'] == DEFAULT_RULES
+	assert sets['priority'] == PRIORITY_RULES
+
+
+def test_rule_watcher_hot_swap(tmp_path):
+	import os
+	import yaml
+	from src.scene_rules import RuleWatcher
+	path = tmp_path / 'rules.yaml'
+	rules = {'active': 'default', 'rule_sets': {'default': DEFAULT_RULES}}
+	path.write_text(yaml.safe_dump(rules), encoding='utf-8')
+	now = [0.0]
+	w = RuleWatcher(str(path), poll_s=1.0, clock=lambda: now[0])
+	c = Counter({'person': 1})
+	assert w.scorer.decide(c) == 'relax'
+
+	# 把人归入工作物品后重新加载
+	changed = dict(DEFAULT_RULES, groups=dict(DEFAULT_RULES['groups'], work_items=['laptop', 'person']))
+	path.write_text(yaml.safe_dump({'active': 'default', 'rule_sets': {'default': changed}}), encoding='utf-8')
+	st = os.stat(path)
+	os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+	assert w.check()                 # 首次检查
+	assert w.scorer.decide(c) == 'work'
+
+	# 编译失败时保留旧规则；未到检查间隔时不读文件
+	path.write_text('rule_sets: {default: {groups: {}, features: {x: [{group: missing}]}, scenes: []}}', encoding='utf-8')
+	os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2 * 10**9))
+	now[0] = 0.5
+	assert not w.check()
+	now[0] = 1.5
+	assert not w.check()
+	assert w.scorer.decide(c) == 'work'
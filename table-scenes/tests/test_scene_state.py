@@ -0,0 +1,150 @@
+# 测试场景状态机与原 run_pipeline 中的场景切换逻辑逐帧等价
+import random
+from collections import Counter
+
+from src.scene_rules import RuleWatcher
+from src.scene_state import SceneStateMachine
+
+
+class FakeWindow:
+	def __init__(self, fullness):
+		self.fullness = fullness
+		self.resets = 0
+
+	def reset(self):
+		self.resets += 1
+
+	def get_buffer_fullness(self):
+		return self.fullness
+
+
+def legacy_update_scene(state, scene, counts, win, hysteresis_s, callback, now):
+	# 原 pipeline._update_scene 的逻辑（去掉日志）
+	last_scene, stable_since = state['last_scene'], state['stable_since']
+	has_poker = any(counts.get(t, 0) > 0 for t in [
+		'poker', 'playing cards', 'deck of cards', 'poker cards', 'card game', 'card deck', 'gaming cards'])
+	has_work_items = any(counts.get(t, 0) > 0 for t in ['laptop', 'book', 'mouse', 'keyboard'])
+	has_dining_items = any(counts.get(t, 0) > 0 for t in [
+		'bowl', 'cup', 'wine glass', 'spoon', 'fork', 'knife', 'dining table'])
+	current_has_items = sum(counts.values()) > 0
+	if scene != last_scene:
+		if not current_has_items and last_scene != 'nothing':
+			scene = last_scene
+		else:
+			force_change = has_poker or (has_work_items and scene == 'work') or \
+				(has_dining_items and scene == 'dining') or (scene != 'nothing' and last_scene != scene)
+			if force_change:
+				win.reset()
+				callback(last_scene if last_scene is not None else '', scene)
+				last_scene, stable_since = scene, None
+			elif stable_since is None:
+				stable_since = now
+			elif now - stable_since >= hysteresis_s:
+				if win.get_buffer_fullness() > 0.7:
+					win.reset()
+				callback(last_scene if last_scene is not None else '', scene)
+				last_scene, stable_since = scene, None
+	else:
+		if (last_scene == 'work' and not has_work_items and current_has_items) or \
+		   (last_scene == 'dining' and not has_dining_items and current_has_items) or \
+		   (last_scene == 'entertaining' and not has_poker and current_has_items):
+			if stable_since is None:
+				stable_since = now
+			elif now - stable_since >= hysteresis_s * 0.5:
+				win.reset()
+				stable_since = None
+		else:
+			stable_since = None
+	state['last_scene'], state['stable_since'] = last_scene, stable_since
+	return scene
+
+
+ITEMS = ['laptop', 'cup', 'bowl', 'person', 'poker cards', 'chopsticks', 'remote', 'bottle']
+
+
+def test_matches_legacy_switching():
+	rng = random.Random(0)
+	rules = RuleWatcher(None)
+	for fullness in (0.5, 0.9):
+		state = {'last_scene': None, 'stable_since': None}
+		sm = SceneStateMachine(0.2, rules=rules)
+		win_a, win_b = FakeWindow(fullness), FakeWindow(fullness)
+		calls_a, calls_b = [], []
+		counts = Counter()
+		for i in range(3000):
+			# 物品组合随机游走，偶尔清空画面
+			if rng.random() < 0.05:
+				counts = Counter()
+			elif rng.random() < 0.3:
+				counts = Counter({k: rng.randint(1, 3) for k in rng.sample(ITEMS, rng.randint(1, 3))})
+			ts = i * 0.05
+			scene = rules.scorer.decide(counts)
+			expected = legacy_update_scene(state, scene, counts, win_a, 0.2, lambda o, n: calls_a.append((o, n)), ts)
+			shown, events = sm.update(counts, ts, win_b.get_buffer_fullness())
+			for ev in events:
+				if ev.kind == 'reset':
+					win_b.reset()
+				elif ev.kind == 'switch':
+					calls_b.append((ev.old if ev.old is not None else '', ev.new))
+			assert shown == expected, i
+			assert sm.scene == state['last_scene']
+		assert calls_a == calls_b and len(calls_a) > 10
+		assert win_a.resets == win_b.resets
+
+
+def test_hysteresis_with_injected_clock():
+	now = [0.0]
+	sm = SceneStateMachine(1.0, rules=RuleWatcher(None), clock=lambda: now[0])
+	# 只有规则外的物品：场景为 nothing，需要稳定 hysteresis_s 才切换
+	scene, events = sm.update(Counter({'bottle': 1}))
+	assert [e.kind for e in events] == ['pending']
+	now[0] = 0.5
+	assert sm.update(Counter({'bottle': 1}))[1] == ()
+	now[0] = 1.0
+	scene, events = sm.update(Counter({'bottle': 1}), fullness=0.9)
+	assert [e.kind for e in events] == ['switch', 'reset'] and sm.scene == 'nothing'
+	# 扑克牌立即切换
+	scene, events = sm.update(Counter({'poker cards': 1}))
+	assert scene == 'entertaining' and events[-1].reason == '扑克牌'
+	# 画面清空时保持上一场景
+	scene, events = sm.update(Counter())
+	assert scene == 'entertaining' and events[0].kind == 'hold'
+
+
+def test_priority_rule_set_uses_its_own_scene_names():
+	# 切换到 priority 规则集后，空场景为 NOLIGHT，切换到它需要迟滞确认
+	rules = RuleWatcher('config/scene_rules.yaml', name='priority', watch=False)
+	sm = SceneStateMachine(1.0, rules=rules)
+	scene, events = sm.update(Counter({'laptop': 1}), 0.0)
+	assert scene == 'WORK' and events[0].kind == 'switch'
+	scene, events = sm.update(Counter({'bottle': 1}), 0.1)
+	assert scene == 'NOLIGHT' and [e.kind for e in events] == ['pending'] and sm.scene == 'WORK'
+	scene, events = sm.update(Counter({'bottle': 1}), 1.1)
+	assert [e.kind for e in events] == ['switch'] and sm.scene == 'NOLIGHT'
+
+
+def test_rule_set_without_switching_is_rejected():
+	import pytest
+	from src.scene_rules import DEFAULT_RULES, compile_rules
+	spec = {k: v for k, v in DEFAULT_RULES.items() if k != 'switching'}
+	with pytest.raises(ValueError):
+		compile_rules(spec)
+	bad = dict(DEFAULT_RULES, switching={'force': [], 'keep': {'work': 'has_missing'}})
+	with pytest.raises(ValueError):
+		compile_rules(bad)
+
+
+def test_count_vector_path_matches_counts():
+	# update_vector 直接对 MultiHorizonCounter 的类别计数向量打分，结果与 {名称: 计数} 路径相同
+	from src.aggregator import MultiHorizonCounter
+	rng = random.Random(1)
+	rules = RuleWatcher(None)
+	win = MultiHorizonCounter(seconds=1, horizons=(5,), fps=20)
+	sm_a, sm_b = SceneStateMachine(0.2, rules=rules), SceneStateMachine(0.2, rules=rules)
+	for i in range(2000):
+		names = rng.sample(ITEMS, rng.randint(0, 3)) if rng.random() < 0.2 or i == 0 else names
+		counts = win.update_and_sum(names, i * 0.05)
+		a = sm_a.update(counts, i * 0.05)
+		b = sm_b.update_vector(win.vector(), win.names, i * 0.05)
+		assert a == b, i
+		assert sm_a.decision == sm_b.decision
@@ -0,0 +1,96 @@
+# 测试流水线阶段图
+from src.stages import Stage, StageGraph
+
+
+def test_stage_graph_keeps_order_and_reports_stats():
+	items = iter(range(10))
+	graph = StageGraph(lambda: next(items, None), [
+		Stage('double', lambda x: x * 2),
+		Stage('drop_odd', lambda x: x if x % 4 == 0 else None),
+	]).start()
+	out = []
+	while True:
+		item = graph.get()
+		if item is None:
+			break
+		out.append(item)
+	graph.stop()
+	assert out == [0, 4, 8, 12, 16]
+	names = [s['name'] for s in graph.stats()]
+	assert names == ['source', 'double', 'drop_odd']
+	assert graph.stats()[1]['processed'] == 10
+
+
+def test_drop_oldest_keeps_latest_and_reports_queue_age():
+	import threading
+	import time
+	release = threading.Event()
+	items = iter(range(20))
+
+	def slow(x):
+		release.wait(1)
+		return x
+
+	graph = StageGraph(lambda: next(items, None), [
+		Stage('pre', lambda x: x),
+		Stage('infer', slow, 1, drop_oldest=True),
+	]).start()
+	time.sleep(0.2)
+	release.set()
+	out = []
+	while True:
+		item = graph.get()
+		if item is None:
+			break
+		out.append(item)
+	graph.stop()
+	# 推理阻塞期间排队的旧帧被丢弃，最后一帧一定会被处理
+	assert out[-1] == 19 and len(out) < 20 and out == sorted(out)
+	infer = graph.stats()[2]
+	assert infer['dropped'] == 20 - len(out)
+	assert infer['max_queue_age_ms'] > 0
+
+
+def test_scene_change_reaches_slow_infer_stage_through_motion_gate():
+	# 30 fps 摄像头、推理 200ms、第 5 帧画面变化：变化帧被 drop_oldest 挤掉后，后续帧仍要触发推理
+	import time
+	import numpy as np
+	from src.motion import MotionGate
+	gate = MotionGate(width=64, refresh_every=1000)
+	still = np.full((360, 640, 3), 100, dtype=np.uint8)
+	changed = still.copy()
+	changed[:, :320] = 255
+	frames = iter(range(30))
+
+	def source():
+		i = next(frames, None)
+		if i is None:
+			return None
+		time.sleep(1 / 30)
+		return {'i': i, 'frame': changed if i >= 5 else still}
+
+	def preprocess(item):
+		# 与 pipeline.run_pipeline 相同：预处理阶段只做推测，不推进门控参考帧
+		item['gray'] = gate.prepare(item['frame'])
+		item['input'] = item['frame'] if gate.would_infer(item['gray']) else None
+		return item
+
+	inferred = []
+
+	def infer(item):
+		if gate.should_infer(item['frame'], gray=item.pop('gray'), commit=False):
+			time.sleep(0.2)
+			gate.commit()
+			inferred.append(item['i'])
+		return item
+
+	graph = StageGraph(source, [
+		Stage('preprocess', preprocess),
+		Stage('infer', infer, 1, drop_oldest=True),
+	]).start()
+	while graph.get() is not None:
+		pass
+	graph.stop()
+	assert inferred[0] == 0
+	assert len(inferred) == 2 and inferred[1] >= 5
+	assert graph.stats()[2]['dropped'] > 0
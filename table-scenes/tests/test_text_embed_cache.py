@@ -0,0 +1,22 @@
+# 测试文本嵌入缓存键
+from src.text_embed_cache import cache_key
+
+
+def test_cache_key_depends_on_weights_and_prompts(tmp_path):
+	weights = tmp_path / 'w.pt'
+	weights.write_bytes(b'abc')
+	cache_dir = str(tmp_path / 'cache')
+	k1 = cache_key(str(weights), ['cup', 'poker'], cache_dir)
+	assert k1 == cache_key(str(weights), ['cup', 'poker'], cache_dir)
+	assert k1 != cache_key(str(weights), ['poker', 'cup'], cache_dir)
+	weights.write_bytes(b'abcd')
+	assert k1 != cache_key(str(weights), ['cup', 'poker'], cache_dir)
+
+
+def test_prompt_groups_from_config():
+	from src.text_embed_cache import load_prompt_groups
+	groups = load_prompt_groups('config/prompts.yaml')
+	assert len(groups) == 21
+	assert sum(len(v) for v in groups.values()) == 51
+	assert groups['cup'] == ['cup']
+	assert 'gaming cards' in groups['poker cards']
@@ -0,0 +1,58 @@
+# 测试分块推理的切块、坐标映射和跨块合并
+import numpy as np
+
+from detections import Detections
+from preprocess import Preprocessor, restore_boxes
+from tiling import Tiler, tile_rects
+
+NAMES = ('cup', 'chopsticks', 'poker cards')
+
+
+def test_tiles_overlap_and_cover_region():
+	rects = tile_rects(100, 50, 1600, 1050, tile=640, overlap=0.25)
+	assert {(x1 - x0, y1 - y0) for x0, y0, x1, y1 in rects} == {(640, 640)}
+	covered = np.zeros((1050, 1600), dtype=bool)
+	for x0, y0, x1, y1 in rects:
+		assert x0 >= 100 and y0 >= 50 and x1 <= 1600 and y1 <= 1050
+		covered[y0:y1, x0:x1] = True
+	assert covered[50:, 100:].all() and not covered[:50].any() and not covered[:, :100].any()
+	# 最后一行/列向内对齐边界，相邻块重叠不少于 overlap
+	xs = sorted({r[0] for r in rects})
+	assert xs[-1] + 640 == 1600
+	assert all(b - a <= 640 * 0.75 for a, b in zip(xs, xs[1:]))
+	# 区域小于块边长时取区域本身
+	assert tile_rects(0, 0, 300, 200, tile=640) == [(0, 0, 300, 200)]
+
+
+def test_rects_clip_crop_to_frame():
+	tiler = Tiler(tile=640)
+	rects = tiler.rects((720, 1280, 3), crop=(-20, 100, 1400, 700))
+	assert min(r[0] for r in rects) == 0 and max(r[2] for r in rects) == 1280
+	assert min(r[1] for r in rects) == 100 and max(r[3] for r in rects) == 700
+	assert tiler.rects((720, 1280, 3), crop=(-20, 100, 1400, 700)) is rects
+
+
+def test_tile_boxes_map_back_to_frame():
+	frame = np.zeros((1080, 1920, 3), dtype=np.uint8)
+	pre = Preprocessor(640, alpha=1, beta=0, letterbox=True)
+	rect = (960, 360, 1600, 1000)
+	prep = pre(frame, rect)
+	assert prep.offset == (960, 360) and prep.scale == 1 and prep.shape == (1080, 1920)
+	dets = Detections([[10, 20, 60, 40]], [0.9], [1], NAMES)
+	restore_boxes(dets, prep)
+	assert dets.xyxy.tolist() == [[970, 380, 1020, 400]]
+
+
+def test_merge_removes_duplicates_across_seams_per_class():
+	tiler = Tiler(classes=['chopsticks', 'poker cards'], iou=0.5)
+	full = Detections([[0, 0, 50, 50]], [0.8], [0], NAMES)
+	# 同一双筷子在两个相邻块中各被检测到一次（接缝处略有偏移），另有一个重叠的扑克牌框和一个被过滤的杯子
+	tiles = Detections([[600, 100, 700, 120], [602, 101, 701, 121], [600, 100, 700, 120], [10, 10, 40, 40]],
+		[0.7, 0.9, 0.6, 0.95], [1, 1, 2, 0], NAMES)
+	tiles = tiler.select(tiles)
+	assert tiles.name_list() == ['chopsticks', 'chopsticks', 'poker cards']
+	merged = tiler.merge(full, tiles)
+	assert sorted(merged.name_list()) == ['chopsticks', 'cup', 'poker cards']
+	kept = merged[merged.cls_id == 1]
+	assert kept.conf.tolist() == [np.float32(0.9)]
+	assert tiler.merge(full, Detections.empty()) is full
@@ -0,0 +1,63 @@
+# 测试跟踪器和按跟踪 id 去重计数
+from src.aggregator import SlidingCounter
+from src.detections import Detections
+from src.tracker import Tracker
+
+NAMES = ('cup', 'chopsticks')
+
+
+def dets_at(x, cls_ids=(0,)):
+	boxes = [[x + 200 * i, 100, x + 200 * i + 50, 150] for i in range(len(cls_ids))]
+	return Detections(boxes, [0.9] * len(cls_ids), list(cls_ids), NAMES)
+
+
+def test_track_ids_persist_and_propagate():
+	tracker = Tracker(iou_thres=0.3, max_age=5)
+	assert tracker.step(None) is None
+	ids = None
+	for i in range(5):
+		out = tracker.step(dets_at(10 * i, (0, 1)))
+		ids = ids if ids is not None else out.track_id.tolist()
+		assert out.track_id.tolist() == ids
+	# 跳过检测的帧沿速度方向推进
+	out = tracker.step(None)
+	assert out.track_id.tolist() == ids
+	assert abs(out.xyxy[0, 0] - 50) < 5
+	for _ in range(6):
+		out = tracker.step(None)
+	assert len(out) == 0
+
+
+def test_unique_counting_by_track_id():
+	win = SlidingCounter(seconds=1, fps=3, unique=True)
+	tracker = Tracker()
+	for i in range(3):
+		counts = win.update_and_sum(tracker.step(dets_at(i)))
+	assert counts == {'cup': 1}
+	raw = SlidingCounter(seconds=1, fps=3)
+	for i in range(3):
+		raw_counts = raw.update_and_sum(dets_at(i))
+	assert raw_counts == {'cup': 3}
+	# 物体离开后窗口滑过，计数归零
+	for _ in range(3):
+		counts = win.update_and_sum(Detections.empty(NAMES))
+	assert counts == {}
+
+
+def test_tracks_survive_motion_gate_on_static_table():
+	# 检测间隔 3、门控每 30 次检查强制推理一次：强制推理间隔 90 帧 > max_age，静止画面的轨迹不能被删除
+	import numpy as np
+	from src.motion import MotionGate
+	gate = MotionGate(width=64, refresh_every=30)
+	tracker = Tracker(max_age=30)
+	win = SlidingCounter(seconds=1, fps=30, unique=True)
+	frame = np.full((360, 640, 3), 100, dtype=np.uint8)
+	static = False
+	for i in range(200):
+		due = i % 3 == 0
+		if due:
+			static = not gate.should_infer(frame)
+		dets = dets_at(10, (0, 1)) if due and not static else None
+		counts = win.update_and_sum(tracker.step(dets, static=static))
+		assert counts == {'cup': 1, 'chopsticks': 1}, i
+	assert gate.skip_rate > 0.9